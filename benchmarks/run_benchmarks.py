@@ -0,0 +1,271 @@
+"""
+    Microbancs d'essai des chemins critiques (réseau, niveaux, vision, attaques), sans dépendance externe.
+
+    python benchmarks/run_benchmarks.py                      # compare avec benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline      # remplace la référence par les mesures courantes
+    python benchmarks/run_benchmarks.py --quick --filter level
+
+    Les durées sont en microsecondes par opération (meilleure de plusieurs répétitions). Une référence n'a de sens
+    que sur la machine qui l'a produite: la régénérer avant de comparer des optimisations sur une autre machine.
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import Game                               # noqa: E402
+from level import Level                             # noqa: E402
+from network import NetCodec                        # noqa: E402
+from network import NetMessage                      # noqa: E402
+from network import NetRXBuffer                     # noqa: E402
+from network import data2message                    # noqa: E402
+from network import encode_message                  # noqa: E402
+from network import message2data                    # noqa: E402
+from pathfinding import DEFAULT_CACHE_SIZE          # noqa: E402
+from pathfinding import UNREACHABLE                 # noqa: E402
+from pathfinding import DistanceField               # noqa: E402
+from pathfinding import move_towards                # noqa: E402
+from players import Samourai                        # noqa: E402
+from visibility import VisibilityTable              # noqa: E402
+from visibility_numpy import NUMPY_AVAILABLE        # noqa: E402
+from visibility_numpy import VectorizedVisibility   # noqa: E402
+
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+MAP_SIZES = (50, 200, 999)
+PLAYER_COUNTS = (7, 70, 700)
+REPEATS = 5
+# Cibles (atteignables, tirées avec une graine fixe) visées tour à tour par la poursuite: plus nombreuses que les
+# champs conservés par DistanceField, pour que chaque appel coûte une inondation
+CHASE_TARGETS = DEFAULT_CACHE_SIZE + 2
+
+
+def generate_level_text(size: int, seed: int = 0) -> str:
+    """Niveau carré entouré de murs, avec des pierres au hasard, les 7 cases de départ et une sortie."""
+    generator = random.Random(seed)
+    rows = [['W'] * size]
+    for _ in range(size - 2):
+        rows.append(['W'] + [generator.choice('     SW') for _ in range(size - 2)] + ['W'])
+    rows.append(['W'] * size)
+
+    cells = generator.sample([(x, y) for x in range(1, size - 1) for y in range(1, size - 1)], 7)
+    for symbol, (x, y) in zip('N123456', cells):
+        rows[y][x] = symbol
+    rows[0][size // 2] = 'E'
+    return "\n".join("".join(row) for row in rows) + "\n"
+
+
+def level_from_text(text: str, number: int = 1) -> Level:
+    tiles = text.replace("\n", "")
+    width = text.index("\n")
+    level = Level()
+    level.setup_from_data(number, width, len(tiles) // width, tiles)
+    return level
+
+
+def game_for(level: Level) -> Game:
+    game = Game()
+    game.set_level(level)
+    for player in game.get_all_players():
+        player.player_active = True
+    return game
+
+
+def measure(operation, number: int = None, repeats: int = REPEATS) -> float:
+    """Retourne la meilleure durée (secondes) d'un appel, sur repeats lots d'appels (taille du lot ajustée au besoin)."""
+    timer = timeit.Timer(operation)
+    if number is None:
+        number, _ = timer.autorange()
+    return min(timer.repeat(repeats, number)) / number
+
+
+def measure_cold(create, operation, number: int) -> float:
+    """Comme measure, mais chaque appel reçoit un nouvel objet (create), préparé hors de la mesure."""
+    best = float('inf')
+    for _ in range(REPEATS):
+        objects = [create() for _ in range(number)]
+        start = time.perf_counter()
+        for item in objects:
+            operation(item)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def network_benchmarks() -> dict:
+    position = NetMessage(NetMessage.CMD['position'], '01', NetMessage.DEST_ALL, '012034n')
+    position_data = message2data(position)
+
+    results = {
+        'message2data': measure(lambda: message2data(position)),
+        'data2message': measure(lambda: data2message(position_data)),
+    }
+
+    for codec in (NetCodec.TEXT, NetCodec.BINARY):
+        results[f'encode_message[{codec}]'] = measure(lambda: encode_message(position, codec))
+
+        # Réassemblage d'un grand tampon (1000 positions) reçu d'un coup: coût par message
+        frames = encode_message(position, codec) * 1000
+
+        def split() -> None:
+            rx_buffer = NetRXBuffer()
+            rx_buffer.feed(frames)
+            rx_buffer.messages()
+
+        results[f'NetRXBuffer.messages[{codec},1000 frames]/message'] = measure(split) / 1000
+
+    return results
+
+
+def level_benchmarks(sizes: tuple) -> dict:
+    results = {}
+    directory = tempfile.mkdtemp()
+    previous_directory = os.getcwd()
+    os.makedirs(os.path.join(directory, 'levels'))
+    try:
+        os.chdir(directory)  # Level.load lit levels/levelN.txt dans le répertoire courant
+        for number, size in enumerate(sizes, 1):
+            text = generate_level_text(size, seed=size)
+            with open(os.path.join('levels', f'level{number}.txt'), 'w') as level_file:
+                level_file.write(text)
+            tiles = text.replace("\n", "")
+
+            def load_text() -> None:
+                compiled_filename = os.path.join('levels', f'level{number}.lvc')
+                if os.path.exists(compiled_filename):
+                    os.remove(compiled_filename)
+                Level().load(number)
+
+            def setup() -> None:
+                Level().setup_from_data(number, size, size, tiles)
+
+            def create_level() -> Level:
+                level = Level()
+                level.setup_from_data(number, size, size, tiles)
+                return level
+
+            # Level.load affiche sa durée de chargement
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                results[f'Level.load[text,{size}x{size}]'] = measure(load_text)
+                results[f'Level.load[compiled,{size}x{size}]'] = measure(lambda: Level().load(number))
+            results[f'Level.setup_from_data[{size}x{size}]'] = measure(setup)
+            results[f'Level.__str__[cold,{size}x{size}]'] = measure_cold(create_level, str, 20)
+            cached_level = create_level()
+            results[f'Level.__str__[cached,{size}x{size}]'] = measure(lambda: str(cached_level))
+    finally:
+        os.chdir(previous_directory)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return results
+
+
+def game_benchmarks(sizes: tuple, player_counts: tuple) -> dict:
+    results = {}
+    for size in sizes:
+        level = level_from_text(generate_level_text(size, seed=size))
+        game = game_for(level)
+        walkable = [(x, y) for y in range(level.height) for x in range(level.width) if level.is_walkable(x, y)]
+        generator = random.Random(size)
+        ninja = game.get_ninja()
+
+        field = DistanceField(level)
+        field.update(ninja.position)
+        reachable = [position for position in walkable if field.distance(*position) != UNREACHABLE]
+
+        # Champ de vision: calcul complet d'une case (cache vidé) puis consultation
+        def viewing_region_cold() -> None:
+            VisibilityTable(level, cache_size=0).visible_cells(generator.choice(walkable))
+
+        table = VisibilityTable.for_level(level)
+        results[f'VisibilityTable.visible_cells[cold,{size}x{size}]'] = measure(viewing_region_cold)
+        results[f'VisibilityTable.is_visible[warm,{size}x{size}]'] = \
+            measure(lambda: table.is_visible(walkable[0], ninja.position))
+
+        def check_for_ennemy() -> None:
+            game.check_for_ennemy(generator.choice(walkable))
+
+        results[f'Game.check_for_ennemy[{size}x{size}]'] = measure(check_for_ennemy)
+
+        def ninja_attack() -> None:
+            ninja.position = generator.choice(walkable)
+            ninja.face_east()
+            game.ninja_attack_target()
+
+        results[f'Game.ninja_attack_target[{size}x{size}]'] = measure(ninja_attack)
+
+        for count in player_counts:
+            positions = [generator.choice(walkable) for _ in range(count)]
+            if NUMPY_AVAILABLE:
+                vectorized = VectorizedVisibility(level)
+                results[f'VectorizedVisibility.can_see[{size}x{size},{count} players]'] = \
+                    measure(lambda: vectorized.can_see(positions, ninja.position))
+            results[f'VisibilityTable.is_visible[{size}x{size},{count} players]'] = \
+                measure(lambda: [table.is_visible(position, ninja.position) for position in positions])
+
+            # Une inondation par déplacement du ninja, puis un pas pour chaque bot: moyenne sur toutes les cibles
+            bots = [Samourai(*position) for position in random.Random(count).choices(reachable, k=count)]
+            targets = itertools.cycle(random.Random(size).sample(reachable, CHASE_TARGETS))
+
+            def chase() -> None:
+                target = next(targets)
+                for bot in bots:
+                    move_towards(bot, level, target)
+
+            results[f'pathfinding.move_towards[{size}x{size},{count} bots]'] = \
+                measure(chase, number=CHASE_TARGETS, repeats=1)
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ninja VS Samouraïs microbenchmarks")
+    parser.add_argument('--quick', action='store_true', help="plus petite carte et plus petit nombre de joueurs")
+    parser.add_argument('--filter', default='', help="n'exécute que les mesures dont le nom contient ce texte")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--output', help="fichier JSON des mesures")
+    args = parser.parse_args()
+
+    sizes = MAP_SIZES[:1] if args.quick else MAP_SIZES
+    player_counts = PLAYER_COUNTS[:1] if args.quick else PLAYER_COUNTS
+
+    results = {}
+    results.update(network_benchmarks())
+    results.update(level_benchmarks(sizes))
+    results.update(game_benchmarks(sizes, player_counts))
+    results = {name: seconds * 1_000_000 for name, seconds in results.items() if args.filter in name}
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+
+    print(f"{'benchmark':<64} {'us/op':>12} {'baseline':>12} {'ratio':>7}")
+    for name, microseconds in results.items():
+        reference = baseline.get(name)
+        if reference:
+            print(f"{name:<64} {microseconds:>12.3f} {reference:>12.3f} {microseconds / reference:>6.2f}x")
+        else:
+            print(f"{name:<64} {microseconds:>12.3f} {'-':>12} {'-':>7}")
+
+    report = {'python': sys.version.split()[0], 'numpy': NUMPY_AVAILABLE, 'results': results}
+    if args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        print("Baseline written to " + args.baseline)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
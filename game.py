@@ -1,10 +1,13 @@
 from enum import Enum
 from enum import auto
+from functools import partial
 
 from level import Level
 from players import Ninja, Player
 from players import Samourai
-from tile import TileType
+from visibility import VisibilityTable
+from visibility_numpy import NUMPY_AVAILABLE
+from visibility_numpy import VectorizedVisibility
 
 
 class GameState(Enum):
@@ -28,6 +31,11 @@ class Game:
         self.player_id = -1
         self.__player_is_ninja = False
         self.__players = []
+        self.__vectorized_visibility = None
+        # Index tenus à jour par les déplacements: joueurs par case, et par rangée et colonne (attaques du ninja)
+        self.__occupants = {}   # {(x, y): {identifiants des joueurs sur la case}}
+        self.__rows = {}        # {y: {identifiant: x}}
+        self.__columns = {}     # {x: {identifiant: y}}
 
         self.state = GameState.STARTING
 
@@ -37,6 +45,41 @@ class Game:
         self.__players.append(Ninja(player_positions[0]['x'], player_positions[0]['y']))
         for i in range(self.__number_of_samourais):
             self.__players.append(Samourai(player_positions[i + 1]['x'], player_positions[i + 1]['y']))
+        self.__index_occupants()
+
+    def __index_occupants(self) -> None:
+        """Reconstruit l'index des cases occupées et s'abonne aux déplacements de tous les joueurs."""
+        self.__occupants.clear()
+        self.__rows.clear()
+        self.__columns.clear()
+        for player_id, player in enumerate(self.__players):
+            self.__add_occupant(player_id, tuple(player.position))
+            player.position_listener = partial(self.__move_occupant, player_id)
+
+    def __add_occupant(self, player_id: int, position: tuple) -> None:
+        x, y = position
+        self.__occupants.setdefault(position, set()).add(player_id)
+        self.__rows.setdefault(y, {})[player_id] = x
+        self.__columns.setdefault(x, {})[player_id] = y
+
+    def __move_occupant(self, player_id: int, previous: tuple, position: tuple) -> None:
+        previous = tuple(previous)
+        occupants = self.__occupants.get(previous)
+        if occupants:
+            occupants.discard(player_id)
+            if not occupants:
+                del self.__occupants[previous]
+        for index, key in ((self.__rows, previous[1]), (self.__columns, previous[0])):
+            line = index.get(key)
+            if line is not None:
+                line.pop(player_id, None)
+                if not line:
+                    del index[key]
+        self.__add_occupant(player_id, tuple(position))
+
+    def get_player_ids_at(self, position) -> set:
+        """Retourne les identifiants des joueurs (actifs ou non) sur une case."""
+        return self.__occupants.get(tuple(position), set())
 
     def i_am_the_ninja(self) -> bool:
         return self.__player_is_ninja
@@ -59,6 +102,7 @@ class Game:
     def next_level(self) -> bool:
         self.__level_number += 1
         self.__level = Level()
+        self.__vectorized_visibility = None
         load_success = self.level.load(self.__level_number)
         if not load_success:
             return load_success
@@ -67,6 +111,7 @@ class Game:
 
     def set_level(self, level) -> None:
         self.__level = level
+        self.__vectorized_visibility = None
         self.__create_ninja_and_samourais()
 
     def update_players_list(self, current_players: str) -> None:
@@ -87,15 +132,61 @@ class Game:
 
     def check_for_ennemy(self, position: list) -> int:
         """verifier si un samourai se trouve sur une case en avant du ninja, sinon, verifie la prochaine case"""
-        for samourai in self.__players:
-            if tuple(position) == samourai.position and samourai.player_active:
-                id_samourai = self.get_all_players().index(samourai)
-                return id_samourai
+        active = [player_id for player_id in self.get_player_ids_at(position)
+                  if self.__players[player_id].player_active]
+        if active:
+            return min(active)
+
+    def is_ninja_visible_by(self, player_id: int) -> bool:
+        """Indique si le ninja se trouve dans le champ de vision d'un samouraï."""
+        visibility = VisibilityTable.for_level(self.level)
+        return visibility.is_visible(self.__players[player_id].position, self.get_ninja().position)
+
+    def get_samourais_seeing_ninja(self) -> list:
+        """Retourne les identifiants des samouraïs actifs qui voient le ninja (calcul groupé si NumPy est présent)."""
+        samourai_ids = [player_id for player_id, player in enumerate(self.__players)
+                        if player_id != 0 and player.player_active]
+        if not samourai_ids:
+            return []
+
+        if not NUMPY_AVAILABLE:
+            return [player_id for player_id in samourai_ids if self.is_ninja_visible_by(player_id)]
+
+        if self.__vectorized_visibility is None:
+            self.__vectorized_visibility = VectorizedVisibility(self.level)
+        positions = [self.__players[player_id].position for player_id in samourai_ids]
+        seen = self.__vectorized_visibility.can_see(positions, self.get_ninja().position)
+        return [player_id for player_id, sees in zip(samourai_ids, seen) if sees]
+
+    def ninja_attack_target(self) -> int or None:
+        """
+            Retourne l'identifiant du joueur actif le plus proche devant le ninja, avant le premier mur (None s'il n'y
+            en a pas; le plus petit identifiant si plusieurs partagent la case). La portée vient des tables de distance
+            aux murs du niveau, et seuls les joueurs de la rangée ou de la colonne visée (index) sont comparés.
+        """
+        ninja = self.get_ninja()
+        ninja_x, ninja_y = ninja.position
+        facing = ninja.get_facing()
+        delta_x, delta_y = Level.DIRECTIONS[facing]
+        reach = self.level.wall_distance(ninja_x, ninja_y, facing)
+
+        if delta_x:
+            line, origin, direction = self.__rows.get(ninja_y, {}), ninja_x, delta_x
+        else:
+            line, origin, direction = self.__columns.get(ninja_x, {}), ninja_y, delta_y
+
+        target = None
+        for player_id, coordinate in line.items():
+            steps = (coordinate - origin) * direction
+            if 0 < steps and (steps, player_id) < (reach, target or 0) and self.__players[player_id].player_active:
+                target = player_id
+                reach = steps   # les joueurs suivants doivent être plus proches
+
+        return target
 
     def check_for_wall(self, position: list) -> bool:
         """verifier si un mur se trouve sur une case en avant du ninja, sinon, verifie la prochaine case"""
-        tile = self.level.get_tile(position[0], position[1])
-        return tile.tile_type == TileType.WALL
+        return self.level.is_wall(position[0], position[1])
 
     def update_player_facing(self, player_id: int, facing: str) -> None:
         """Met a jour la direction du joueur"""
@@ -1,3 +1,5 @@
+import weakref
+
 from game import Game
 from game import GameState
 from level import Level
@@ -8,22 +10,39 @@ from network import NetSettings
 class GameClient:
     """Côté client de la couche application de la communication réseau."""
 
-    def __init__(self, host: str, port: int = NetSettings.SERVER_PORT) -> None:
-        self.__network_client = NetClient(host, port)
+    # Messages qui concernent les joueurs de la partie, ignorés tant que le niveau (et donc les joueurs) n'est pas reçu:
+    # la liste des joueurs actifs (CMD_PLL) donnera ensuite l'état courant
+    __PLAYER_COMMANDS = {NetMessage.CMD['position'], NetMessage.CMD['snapshot'], NetMessage.CMD['active'],
+                         NetMessage.CMD['queryPosition'], NetMessage.CMD['hit']}
+
+    # Niveaux reçus, partagés (en lecture seule) par les clients d'un même processus: {données de CMD_LVL: niveau}
+    __levels = weakref.WeakValueDictionary()
+
+    def __init__(self, host: str, port: int = NetSettings.SERVER_PORT, codec: str = NetSettings.CODEC,
+                 network_client=None, close_window=None) -> None:
+        # Tout client réseau offrant l'interface de NetClient (ex.: AsyncNetClient connecté) peut être fourni.
+        self.__network_client = network_client or NetClient(host, port, codec)
         self.__session_id = '99'
 
+        # Appelée lorsque la partie se termine pour ce joueur (ex.: fermer la fenêtre arcade)
+        self.__close_window_callback = close_window
+        self.stopped = False
+
     def handle_messages(self, game: Game) -> None:
         """Traite les messages reçus par le client réseau."""
         messages = self.__network_client.receive()
         for message in messages:
+            if message.command in self.__PLAYER_COMMANDS and not game.get_all_players():
+                continue
             if message.is_position():
-                x = message.data[:NetMessage.DATA_POS_BYTES]
-                y = message.data[NetMessage.DATA_POS_BYTES:NetMessage.DATA_POS_BYTES * 2]
-                facing = message.data[-1]
-                player_id = int(message.source)
-                if x.isdigit():
-                    game.update_player_position(player_id, (int(x), int(y)))
-                    game.update_player_facing(player_id, facing)
+                self.__update_position(game, int(message.source), message.data)
+            elif message.is_snapshot():
+                entry_bytes = NetMessage.DATA_SNAPSHOT_ENTRY_BYTES
+                for offset in range(0, len(message.data) - entry_bytes + 1, entry_bytes):
+                    entry = message.data[offset:offset + entry_bytes]
+                    player_id = entry[:NetMessage.SRC_BYTES]
+                    if player_id.isdigit():
+                        self.__update_position(game, int(player_id), entry[NetMessage.SRC_BYTES:])
             elif message.is_session_id():
                 data = message.data
                 if data.isdigit():
@@ -33,7 +52,7 @@ class GameClient:
                         game.declare_ninja()
                     game.state = GameState.STARTED
             elif message.is_level():
-                game.set_level(self.__unserialize_level(message.data))
+                game.set_level(self.__get_level(message.data))
                 game.state = GameState.LEVEL_RECEIVED
             elif message.is_players_list():
                 game.update_players_list(message.data)
@@ -48,6 +67,11 @@ class GameClient:
                 elif msg_active.isdigit():
                     is_active = bool(int(msg_active))
                     game.update_is_active(player_id, is_active)
+            elif message.is_udp_offer():
+                port = message.data[:NetMessage.DATA_UDP_PORT_BYTES]
+                token = message.data[NetMessage.DATA_UDP_PORT_BYTES:]
+                if port.isdigit() and token:
+                    self.__network_client.enable_udp(int(port), token)
             elif message.is_query_position():
                 player = game.get_current_player()
                 self.send_position(player.position, player.get_facing())
@@ -69,17 +93,38 @@ class GameClient:
                 self.stop()
                 self.__close_window()
 
+    @staticmethod
+    def __update_position(game: Game, player_id: int, data: str) -> None:
+        """Met à jour la position et la direction d'un joueur à partir de données xxxyyyf."""
+        x = data[:NetMessage.DATA_POS_BYTES]
+        y = data[NetMessage.DATA_POS_BYTES:NetMessage.DATA_POS_BYTES * 2]
+        facing = data[-1]
+        if x.isdigit() and y.isdigit():
+            game.update_player_position(player_id, (int(x), int(y)))
+            game.update_player_facing(player_id, facing)
+
     def __close_window(self):
-        from ninja_vs_samourais_client import close_window
-        close_window()
+        if self.__close_window_callback:
+            self.__close_window_callback()
+
+    @classmethod
+    def __get_level(cls, level_string: str) -> Level or None:
+        """Retourne le niveau décrit par une chaîne, déjà construit si un autre client du processus l'a reçu."""
+        level = cls.__levels.get(level_string)
+        if level is None:
+            level = cls.__unserialize_level(level_string)
+            if level is not None:
+                cls.__levels[level_string] = level
+        return level
 
     def __send(self, message: NetMessage) -> None:
         """Envoie un message au serveur."""
         self.__network_client.send(message)
 
     def send_level_query(self) -> None:
-        """Envoie une demande de niveau."""
-        net_msg = NetMessage(NetMessage.CMD['level'], self.__session_id, NetMessage.DEST_ALL, '')
+        """Envoie une demande de niveau (compressé)."""
+        net_msg = NetMessage(NetMessage.CMD['level'], self.__session_id, NetMessage.DEST_ALL,
+                             NetMessage.DATA_LVL_COMPRESSED)
         self.__send(net_msg)
 
     def send_players_list_query(self) -> None:
@@ -110,6 +155,11 @@ class GameClient:
     @staticmethod
     def __unserialize_level(level_string: str) -> Level or None:
         """Crée un niveau à partir d'une chaîne de caractères représentant un niveau."""
+        if level_string.startswith(NetMessage.DATA_LVL_COMPRESSED):
+            level_string = Level.decompress(level_string)
+            if level_string is None:
+                return None
+
         number_string = level_string[:NetMessage.DATA_LVL_NUMBER_BYTES]
         if not number_string.isdigit():
             return None
@@ -136,7 +186,14 @@ class GameClient:
     def start(self) -> None:
         self.__network_client.start()
 
+    async def wait_for_messages(self) -> None:
+        """Attend l'arrivée de messages (client réseau asyncio seulement)."""
+        await self.__network_client.wait_for_messages()
+
     def stop(self) -> None:
+        if self.stopped:
+            return
+        self.stopped = True
         message = NetMessage(NetMessage.CMD['close'], self.__session_id, NetMessage.DEST_ALL, '0')
         self.__send(message)
         self.__network_client.stop()
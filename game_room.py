@@ -0,0 +1,187 @@
+from game import Game
+from level import Level
+from network import NetMessage
+
+
+PLAYERS_PER_ROOM = 7    # le ninja et 6 samouraïs
+NINJA_PLAYER_ID = '00'
+SNAPSHOT_KEYFRAME_TICKS = 20    # un instantané complet (toutes les positions) tous les N ticks
+
+
+class GameRoom:
+    """
+        Partie (salle) hébergée par le serveur: sa propre instance de Game, ses joueurs et sa logique de fin de partie.
+        Les joueurs sont identifiés dans la salle par leur numéro (00 à 06), et chacun est associé à une session réseau.
+    """
+
+    def __init__(self, number: int, level: Level, network_server, snapshot: bool = False) -> None:
+        self.number = number
+        self.game = Game()
+        self.game.set_level(level)  # le niveau est partagé, en lecture seule, entre toutes les salles
+
+        # Tout objet offrant send_to_session et close_session_controller (normalement le GameServer)
+        self.__network_server = network_server
+        self.__sessions = {}    # {joueur: session_id}
+        self.__player_ids = {}  # {session_id: joueur}
+
+        self.__is_possible_to_win = False
+        self.__players = []
+        self.ended = False
+
+        # Mode instantané: les positions sont agrégées et envoyées une fois par tick (send_snapshots)
+        self.__snapshot = snapshot
+        self.__positions = {}           # {joueur: xxxyyyf}, dernière position connue
+        self.__changed_positions = {}   # joueurs déplacés depuis le dernier instantané (dans l'ordre)
+        self.__ticks_since_keyframe = 0
+
+    def __send(self, message: NetMessage) -> None:
+        """Envoie un message à/aux joueurs de la salle dans la destination."""
+        if message.destination != NetMessage.DEST_ALL:
+            session_id = self.__sessions.get(message.destination)
+            if session_id is not None:
+                self.__network_server.send_to_session(session_id, message)
+        else:
+            for session_id in self.__sessions.values():
+                self.__network_server.send_to_session(session_id, message)
+
+    def __send_to_all_but_source(self, message: NetMessage) -> None:
+        """Envoie un message à tous les joueurs de la salle sauf celui identifié comme la source du message."""
+        for player_id, session_id in self.__sessions.items():
+            if player_id != message.source:
+                self.__network_server.send_to_session(session_id, message)
+
+    def has_free_slot(self) -> bool:
+        return not self.ended and len(self.__sessions) < PLAYERS_PER_ROOM
+
+    def is_empty(self) -> bool:
+        return not self.__sessions
+
+    def join(self, session_id: int) -> str:
+        """Associe une session au premier numéro de joueur libre et le lui transmet."""
+        player_id = next(str(number).zfill(NetMessage.SRC_BYTES) for number in range(PLAYERS_PER_ROOM)
+                         if str(number).zfill(NetMessage.SRC_BYTES) not in self.__sessions)
+        self.__sessions[player_id] = session_id
+        self.__player_ids[session_id] = player_id
+
+        self.__send(NetMessage(NetMessage.CMD['sessionID'], NetMessage.SRC_SERVER, player_id, str(int(player_id))))
+        print(f"Client {player_id} joined room {self.number}")
+        return player_id
+
+    def __leave(self, session_id: int) -> None:
+        player_id = self.__player_ids.pop(session_id)
+        del self.__sessions[player_id]
+        self.__positions.pop(player_id, None)
+        self.__changed_positions.pop(player_id, None)
+        self.__network_server.close_session_controller(str(session_id))
+
+    def handle_message(self, message: NetMessage) -> None:
+        """Traite un message reçu d'un joueur de la salle."""
+        if message.is_position():
+            if self.__snapshot:
+                self.__record_position(message.source, message.data)
+                return
+            net_msg = NetMessage(message.command, message.source, NetMessage.DEST_ALL, message.data)
+            self.__send_to_all_but_source(net_msg)
+        elif message.is_level():
+            compressed = message.data == NetMessage.DATA_LVL_COMPRESSED
+            self.send_level_to(message.source, self.game.level.serialize(compressed))
+        elif message.is_active():
+            self.__players.append(message.source)
+            self.send_players_list_to(message.source, ",".join(self.__players))
+            self.send_new_player_active(message.source)
+            self.send_query_position(message.source)
+        elif message.is_session_close():
+            player_id = self.__player_ids.get(message.session)
+            if player_id is None:
+                return
+            if player_id not in self.__players:
+                self.__leave(message.session)
+                return
+            self.__players.remove(player_id)
+            net_msg = NetMessage(message.command, player_id, NetMessage.DEST_ALL, message.data)
+            self.__send_to_all_but_source(net_msg)
+            self.__leave(message.session)
+            self.check_for_end_game(player_id)
+        elif message.is_hit():
+            net_msg = NetMessage(message.command, message.source, message.destination, message.data)
+            self.__send(net_msg)
+
+    def __record_position(self, source: str, data: str) -> None:
+        """Conserve la dernière position d'un joueur pour le prochain instantané."""
+        pos_bytes = NetMessage.DATA_POS_BYTES * 2
+        if len(data) <= pos_bytes or not data[:pos_bytes].isdigit():
+            return
+        self.__positions[source] = data[:pos_bytes] + data[-1]
+        self.__changed_positions[source] = True
+
+    def send_snapshots(self) -> None:
+        """
+            Envoie à chaque joueur un seul message regroupant les positions des autres joueurs qui ont bougé.
+            Un instantané sur UDP peut être perdu: tous les SNAPSHOT_KEYFRAME_TICKS ticks, l'instantané contient
+            plutôt toutes les positions connues, ce qui corrige celles d'un joueur immobile depuis la perte.
+        """
+        self.__ticks_since_keyframe += 1
+        if self.__ticks_since_keyframe >= SNAPSHOT_KEYFRAME_TICKS:
+            self.__ticks_since_keyframe = 0
+            sources = self.__positions
+        elif self.__changed_positions:
+            sources = self.__changed_positions
+        else:
+            return
+
+        entries = {source: source + self.__positions[source] for source in sources}
+        self.__changed_positions.clear()
+
+        for destination in self.__players:
+            data = "".join(entry for source, entry in entries.items() if source != destination)
+            if data:
+                self.__send(NetMessage(NetMessage.CMD['snapshot'], NetMessage.SRC_SERVER, destination, data))
+
+    def send_level(self, level: str) -> None:
+        """Envoie un niveau de jeu à tous les joueurs de la salle."""
+        net_msg = NetMessage(NetMessage.CMD['level'], NetMessage.SRC_SERVER, NetMessage.DEST_ALL, level)
+        self.__send(net_msg)
+
+    def send_level_to(self, destination: str, level: str) -> None:
+        """Envoie un niveau de jeu à un joueur (destination)."""
+        net_msg = NetMessage(NetMessage.CMD['level'], NetMessage.SRC_SERVER, destination, level)
+        self.__send(net_msg)
+
+    def send_players_list_to(self, destination: str, players: str) -> None:
+        """Envoie une liste de tout les joueurs deja present dans le jeu à un joueur (destination)."""
+        net_msg = NetMessage(NetMessage.CMD['players'], NetMessage.SRC_SERVER, destination, players)
+        self.__send(net_msg)
+
+        if destination == NINJA_PLAYER_ID:
+            self.__is_possible_to_win = True
+
+    def check_for_end_game(self, close_source: str) -> None:
+        """Verifie si la partie est finie et envoie que la partie est finie aux joueurs dans le cas echeant"""
+        if self.__is_possible_to_win:
+            if len(self.__players) <= 0:
+                print(f'No players left in room {self.number}!')
+                return
+            if close_source == NINJA_PLAYER_ID and len(self.__players) > 0:
+                print(f'The samourais have won in room {self.number}!')
+                self.send_end_game(NetMessage.VICTORY_TYPE[1])
+                return
+            if NINJA_PLAYER_ID in self.__players and len(self.__players) == 1:
+                print(f'The ninja won in room {self.number}!')
+                self.send_end_game(NetMessage.VICTORY_TYPE[0])
+                return
+
+    def send_new_player_active(self, source: str) -> None:
+        """Averti qu'un nouveau joueur s'est ajoute a la partie"""
+        net_msg = NetMessage(NetMessage.CMD['active'], source, NetMessage.DEST_ALL, '1')
+        self.__send(net_msg)
+
+    def send_query_position(self, source: str) -> None:
+        """Demande a tous les joueurs de la salle d'envoyer leur position"""
+        net_msg = NetMessage(NetMessage.CMD['queryPosition'], source, NetMessage.DEST_ALL, '')
+        self.__send(net_msg)
+
+    def send_end_game(self, data: str) -> None:
+        """Envoie a tous les joueurs de la salle que la partie est terminee"""
+        self.ended = True
+        net_msg = NetMessage(NetMessage.CMD['endGame'], NetMessage.SRC_SERVER, NetMessage.DEST_ALL, data)
+        self.__send(net_msg)
@@ -1,52 +1,138 @@
+import time
+import weakref
+
 from game import Game
+from game_room import GameRoom
+from game_room import PLAYERS_PER_ROOM
+from metrics import METRICS
 from network import NetMessage
 from network import NetServer
 from network import NetSettings
+from network import NetUDPChannel
 
 
-class GameServer:
-    """Côté serveur de la couche application de la communication réseau."""
+SESSIONS_OPENED = METRICS.counter('sessions_opened_total', "Sessions placées dans une salle")
+SESSIONS_REFUSED = METRICS.counter('sessions_refused_total', "Sessions refusées (toutes les salles sont pleines)")
+HANDLE_MESSAGES_DURATION = METRICS.histogram('handle_messages_seconds', "Durée de GameServer.handle_messages")
 
-    def __init__(self, host: str = NetSettings.SERVER_HOST, port: int = NetSettings.SERVER_PORT) -> None:
-        self.__network_server = NetServer(host, port)
-        self.__is_possible_to_win = False
-        self.__players = []
+# Serveurs de jeu du processus pas encore arrêtés. Les jauges, calculées à la lecture des mesures seulement,
+# additionnent leurs valeurs sans les garder en vie.
+_GAME_SERVERS = weakref.WeakSet()
 
-    def __send(self, message: NetMessage) -> None:
-        """Envoie un message à/aux clients dans la destination."""
-        self.__network_server.send(message)
+METRICS.gauge('sessions', "Sessions placées dans une salle",
+              lambda: sum(server.session_count for server in list(_GAME_SERVERS)))
+METRICS.gauge('rooms', "Salles (parties) hébergées", lambda: sum(len(server.rooms) for server in list(_GAME_SERVERS)))
+METRICS.gauge('tx_queue_depth', "Messages en attente d'envoi, toutes sessions",
+              lambda: sum(server.tx_queue_depth for server in list(_GAME_SERVERS)))
+METRICS.gauge('rx_queue_depth', "Messages reçus en attente de traitement, toutes sessions",
+              lambda: sum(server.rx_queue_depth for server in list(_GAME_SERVERS)))
 
-    def __send_to_all_but_source(self, message: NetMessage) -> None:
-        """Envoie un message à tous les clients sauf celui identifié comme la source du message."""
-        self.__network_server.send_to_all_but_one(message, message.source)
+
+class GameServer:
+    """
+        Côté serveur de la couche application de la communication réseau.
+        Chaque nouvelle session est placée dans une salle (partie) qui a une place libre; jusqu'à max_rooms salles
+        sont hébergées en même temps et partagent le même niveau.
+    """
+
+    def __init__(self, host: str = NetSettings.SERVER_HOST, port: int = NetSettings.SERVER_PORT,
+                 network_server=None, snapshot: bool = False, max_rooms: int = 1, udp: bool = False) -> None:
+        # Toute couche réseau offrant l'interface de NetServer (ex.: NetSelectorServer) peut être fournie.
+        # Elle doit laisser le serveur de jeu attribuer les numéros de joueur (announce_sessions=False).
+        self.__network_server = network_server or NetServer(host, port, max_rooms * PLAYERS_PER_ROOM,
+                                                            announce_sessions=False)
+        self.__snapshot = snapshot
+        self.__max_rooms = max_rooms
+
+        # Canal UDP optionnel pour les positions et instantanés (ouvert au démarrage, sur le port du serveur TCP)
+        self.__host = host
+        self.__udp = udp
+        self.__udp_channel = None
+
+        self.__rooms = []
+        self.__rooms_by_session = {}    # {session_id: salle}
+        self.__last_room_number = 0
+
+        _GAME_SERVERS.add(self)
+
+    def __open_session(self, session_id: int, game: Game) -> None:
+        """Place une nouvelle session dans une salle, ou la refuse si toutes les salles sont pleines."""
+        room = next((room for room in self.__rooms if room.has_free_slot()), None)
+        if not room and len(self.__rooms) < self.__max_rooms:
+            self.__last_room_number += 1
+            room = GameRoom(self.__last_room_number, game.level, self, self.__snapshot)
+            self.__rooms.append(room)
+
+        if not room:
+            self.__network_server.send_to_session(session_id, NetMessage(
+                NetMessage.CMD['close'], NetMessage.SRC_SERVER, NetMessage.DEST_UNDEFINED,
+                "No spot is left for another player"))
+            self.close_session_controller(str(session_id))
+            SESSIONS_REFUSED.inc()
+            print("No spot is left for another player")
+            return
+
+        player_id = room.join(session_id)
+        self.__rooms_by_session[session_id] = room
+        SESSIONS_OPENED.inc()
+
+        if self.__udp_channel:
+            port = str(self.get_port()).zfill(NetMessage.DATA_UDP_PORT_BYTES)
+            token = self.__udp_channel.register(session_id)
+            self.send_to_session(session_id, NetMessage(NetMessage.CMD['udp'], NetMessage.SRC_SERVER, player_id,
+                                                        port + token))
+
+    def __start_udp(self, on_receive=None) -> None:
+        if self.__udp:
+            self.__udp_channel = NetUDPChannel.bind(self.__host, self.get_port())
+            self.__udp_channel.on_receive = on_receive
+            self.__udp_channel.start()
+
+    def close_session_controller(self, session_id: str) -> None:
+        """Ferme une session (TCP et UDP)."""
+        if self.__udp_channel:
+            self.__udp_channel.forget(int(session_id))
+        self.__network_server.close_session_controller(session_id)
+
+    def send_to_session(self, session_id: int, message: NetMessage) -> None:
+        """Envoie un message à une session; les positions passent par UDP si le client y est joignable."""
+        if self.__udp_channel and message.command in NetUDPChannel.COMMANDS and \
+                self.__udp_channel.has_peer(session_id):
+            self.__udp_channel.send_to_session(session_id, message)
+        else:
+            self.__network_server.send_to_session(session_id, message)
 
     def handle_messages(self, game: Game) -> None:
-        """Traite les messages reçus par le serveur réseau."""
+        """Traite les messages reçus par le serveur réseau et les achemine vers la salle de leur session."""
+        started = time.perf_counter()
         messages = self.__network_server.receive()
+        if self.__udp_channel:
+            messages.extend(self.__udp_channel.receive())
         for message in messages:
-            if message.is_position():
-                net_msg = NetMessage(message.command, message.source, NetMessage.DEST_ALL, message.data)
-                self.__send_to_all_but_source(net_msg)
-            elif message.is_level():
-                self.send_level_to(message.source, str(game.level))
-            elif message.is_active():
-                self.__players.append(message.source)
-                self.send_players_list_to(message.source, ",".join(self.__players))
-                self.send_new_player_active(message.source)
-                self.send_query_position(message.source)
-            elif message.is_session_close():
-                if not message.source in self.__players:
-                    return
-                self.__players.remove(message.source)
-                net_msg = NetMessage(message.command, message.source, NetMessage.DEST_ALL, message.data)
-                self.__send_to_all_but_source(net_msg)
-                if message.source in self.__players:
-                    self.__players.remove(message.source)
-                self.__network_server.close_session_controller(message.source)
-                self.check_for_end_game(message.source)
-            elif message.is_hit():
-                net_msg = NetMessage(message.command, message.source, message.destination, message.data)
-                self.__send(net_msg)
+            if message.is_session_id():
+                # Nouvelle connexion signalée par la couche réseau. Un SID envoyé par un client est ignoré:
+                # il pourrait sinon occuper toutes les places des salles.
+                if message.local:
+                    self.__open_session(message.session, game)
+                continue
+
+            room = self.__rooms_by_session.get(message.session)
+            if not room:
+                continue
+
+            room.handle_message(message)
+
+            if message.is_session_close():
+                del self.__rooms_by_session[message.session]
+                if room.is_empty():
+                    self.__rooms.remove(room)
+
+        HANDLE_MESSAGES_DURATION.record(time.perf_counter() - started)
+
+    def send_snapshots(self) -> None:
+        """Envoie les instantanés de positions de chaque salle."""
+        for room in self.__rooms:
+            room.send_snapshots()
 
     def get_ip(self) -> str:
         return self.__network_server.get_ip()
@@ -54,56 +140,47 @@ class GameServer:
     def get_port(self) -> int:
         return self.__network_server.get_port()
 
-    def send_level(self, level: str) -> None:
-        """Envoie un niveau de jeu à tous les clients."""
-        net_msg = NetMessage(NetMessage.CMD['level'], NetMessage.SRC_SERVER, NetMessage.DEST_ALL, level)
-        self.__send(net_msg)
-
-    def send_level_to(self, destination: str, level: str) -> None:
-        """Envoie un niveau de jeu à un client (destination)."""
-        net_msg = NetMessage(NetMessage.CMD['level'], NetMessage.SRC_SERVER, destination, level)
-        self.__send(net_msg)
-
-    def send_players_list_to(self, destination: str, players: str) -> None:
-        """Envoie une liste de tout les joueurs deja present dans le jeu à un client (destination)."""
-        net_msg = NetMessage(NetMessage.CMD['players'], NetMessage.SRC_SERVER, destination, players)
-        self.__send(net_msg)
-
-        if destination == '00':
-            self.__is_possible_to_win = True
-
-    def check_for_end_game(self, close_source: str) -> None:
-        """Verifie si la partie est finie et envoie que la partie est finie aux clients dans le cas echeant"""
-        if self.__is_possible_to_win:
-            if len(self.__players) <= 0:
-                print('No players left in the game!')
-                return
-            if close_source == '00' and len(self.__players) > 0:
-                print('The samourais have won!')
-                self.send_end_game(NetMessage.VICTORY_TYPE[1])
-                return
-            if '00' in self.__players and len(self.__players) == 1:
-                print('The ninja won!')
-                self.send_end_game(NetMessage.VICTORY_TYPE[0])
-                return
-
-    def send_new_player_active(self, source: str) -> None:
-        """Averti qu'un nouveau joueur s'est ajoute a la partie"""
-        net_msg = NetMessage(NetMessage.CMD['active'], source, NetMessage.DEST_ALL, '1')
-        self.__send(net_msg)
-
-    def send_query_position(self, source: str) -> None:
-        """Demande a tous les clients d'envoyer leur position"""
-        net_msg = NetMessage(NetMessage.CMD['queryPosition'], source, NetMessage.DEST_ALL, '')
-        self.__send(net_msg)
-
-    def send_end_game(self, data: str) -> None:
-        """Envoie a tous les clients que la partie est terminee"""
-        net_msg = NetMessage(NetMessage.CMD['endGame'], NetMessage.SRC_SERVER, NetMessage.DEST_ALL, data)
-        self.__send(net_msg)
+    @property
+    def rooms(self) -> list:
+        return self.__rooms
+
+    @property
+    def session_count(self) -> int:
+        """Nombre de sessions placées dans une salle."""
+        return len(self.__rooms_by_session)
+
+    @property
+    def dropped_messages(self) -> int:
+        """Messages retirés des files d'envoi (positions remplacées, instantanés fusionnés), sessions ouvertes."""
+        return sum(getattr(ctrl, 'dropped', 0) for ctrl in self.__network_server.sessions_controllers() if ctrl)
+
+    @property
+    def tx_queue_depth(self) -> int:
+        """Messages en attente d'envoi, toutes les sessions de la couche réseau."""
+        return sum(getattr(ctrl, 'tx_depth', 0) for ctrl in self.__network_server.sessions_controllers() if ctrl)
+
+    @property
+    def rx_queue_depth(self) -> int:
+        """Messages reçus pas encore traités par handle_messages, toutes les sessions de la couche réseau."""
+        return sum(getattr(ctrl, 'rx_depth', 0) for ctrl in self.__network_server.sessions_controllers() if ctrl)
 
     def start(self) -> None:
         self.__network_server.start()
+        self.__start_udp()
+
+    async def start_async(self) -> None:
+        """Démarre une couche réseau asyncio (AsyncNetServer) dans la boucle courante."""
+        await self.__network_server.start_serving()
+        # Les positions reçues par UDP doivent aussi réveiller la boucle qui attend les messages TCP
+        self.__start_udp(self.__network_server.notify_messages)
+
+    async def wait_for_messages(self) -> None:
+        """Attend l'arrivée de messages (couche réseau asyncio seulement)."""
+        await self.__network_server.wait_for_messages()
 
     def stop(self) -> None:
+        _GAME_SERVERS.discard(self)
         self.__network_server.stop()
+        if self.__udp_channel:
+            self.__udp_channel.stop()
+            self.__udp_channel.join()
@@ -0,0 +1,220 @@
+import multiprocessing
+import selectors
+import socket
+import struct
+import sys
+import threading
+
+from game import Game
+from game_room import PLAYERS_PER_ROOM
+from game_server import GameServer
+from metrics import MetricsServer
+from network import LISTEN_QUEUE
+from network import NetMessage
+from network import NetSelectorServer
+from network import NetSettings
+from network import encode_message
+from tick_scheduler import DEFAULT_TICK_RATE
+from tick_scheduler import TickScheduler
+
+
+OCCUPANCY = struct.Struct('>I')     # rapport d'un processus de travail: nombre de sessions dans ses salles
+HANDOFF_TAG = b'S'                  # accompagne chaque connexion transmise à un processus de travail
+
+
+def run_worker(channel: socket.socket, inherited: list, max_rooms: int, snapshot: bool, tick_rate: float,
+               metrics_port: int = None) -> None:
+    """
+        Programme d'un processus de travail: un GameServer (boucle selectors) qui ne sert que les connexions
+        transmises par le superviseur et qui lui rapporte son occupation lorsqu'elle change, ainsi qu'après chaque
+        connexion transmise (même refusée ou perdue) pour corriger le compte tenu par le superviseur.
+        Si metrics_port est fourni, le processus publie ses propres mesures sur ce port.
+    """
+    # Les sockets du superviseur hérités au fork doivent être fermés, sinon les autres canaux ne verraient jamais
+    # la fin de connexion de leur côté.
+    for inherited_socket in inherited:
+        inherited_socket.close()
+
+    network_server = NetSelectorServer(max_sessions=max_rooms * PLAYERS_PER_ROOM, announce_sessions=False,
+                                       listen=False)
+    game_server = GameServer(network_server=network_server, snapshot=snapshot, max_rooms=max_rooms)
+    scheduler = TickScheduler(tick_rate)
+
+    game = Game()
+    if not game.next_level():
+        return
+
+    def receive_connections() -> None:
+        while True:
+            try:
+                _, fds, _, _ = socket.recv_fds(channel, len(HANDOFF_TAG), 1)
+            except OSError:
+                fds = []
+            if not fds:
+                # Le superviseur a fermé le canal: on arrête le processus
+                scheduler.stop()
+                return
+            network_server.adopt(socket.socket(fileno=fds[0]))
+
+    last_report = None  # (connexions adoptées, sessions) au dernier rapport
+
+    def handle_messages() -> None:
+        # Une connexion comptée avant le traitement a déjà signalé sa session (ou a été refusée ou perdue):
+        # le rapport qui suit tient compte de toutes celles-ci, même si l'occupation n'a pas changé.
+        adopted = network_server.adopted
+        game_server.handle_messages(game)
+        report_occupancy(adopted)
+
+    def report_occupancy(adopted: int) -> None:
+        nonlocal last_report
+        report = (adopted, game_server.session_count)
+        if report != last_report:
+            last_report = report
+            try:
+                channel.send(OCCUPANCY.pack(game_server.session_count))
+            except OSError:
+                scheduler.stop()
+
+    game_server.start()
+    threading.Thread(target=receive_connections, daemon=True).start()
+    if metrics_port is not None:
+        MetricsServer(port=metrics_port).start()
+
+    scheduler.add_task(handle_messages)
+    scheduler.add_task(game_server.send_snapshots)
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+    game_server.stop()
+
+
+class GameSupervisor:
+    """
+        Répartit les parties sur plusieurs processus de travail (un GameServer chacun) pour utiliser tous les coeurs.
+        Le superviseur accepte les connexions et transmet chacune (son descripteur de fichier) au processus
+        le moins occupé, selon les rapports d'occupation reçus par un canal Unix propre à chaque processus.
+    """
+
+    def __init__(self, workers: int, host: str = NetSettings.SERVER_HOST, port: int = NetSettings.SERVER_PORT,
+                 max_rooms: int = 1, snapshot: bool = False, tick_rate: float = DEFAULT_TICK_RATE,
+                 metrics_port: int = None) -> None:
+        print("Starting supervisor...")
+
+        self.__server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__server_socket.setblocking(False)
+        try:
+            self.__server_socket.bind((host, port))
+        except socket.error:
+            print("ERROR : Failed to bind socket.")
+            sys.exit()
+
+        self.__worker_count = workers
+        self.__worker_settings = (max_rooms, snapshot, tick_rate)
+        self.__metrics_port = metrics_port     # mesures du processus de travail i sur metrics_port + i
+        self.__capacity = max_rooms * PLAYERS_PER_ROOM
+
+        self.__channels = []
+        self.__occupancy = []   # sessions par processus (rapportées, plus celles transmises depuis le dernier rapport)
+        self.__processes = []
+
+        self.__selector = selectors.DefaultSelector()
+        self.running = False
+
+    def __dispatch(self) -> None:
+        """Accepte une connexion et la transmet au processus de travail le moins occupé."""
+        try:
+            client_socket, ip_address = self.__server_socket.accept()
+        except BlockingIOError:
+            return
+
+        while True:
+            worker = min(range(len(self.__channels)), key=lambda index: self.__occupancy[index])
+            if self.__occupancy[worker] >= self.__capacity:
+                try:
+                    client_socket.sendall(encode_message(NetMessage(
+                        NetMessage.CMD['close'], NetMessage.SRC_SERVER, NetMessage.DEST_UNDEFINED,
+                        "No spot is left for another player"), NetSettings.CODEC))
+                except OSError:
+                    pass    # le client est déjà parti
+                client_socket.close()
+                print("No spot is left for another player")
+                return
+
+            try:
+                socket.send_fds(self.__channels[worker], [HANDOFF_TAG], [client_socket.fileno()])
+                break
+            except OSError:
+                # Processus arrêté dont la fin du canal n'a pas encore été lue: on essaie le suivant
+                self.__retire_worker(worker)
+
+        client_socket.close()
+        self.__occupancy[worker] += 1
+        print(f"Client from {ip_address[0]}:{ip_address[1]} sent to worker {worker}")
+
+    def __read_occupancy(self, worker: int) -> None:
+        try:
+            report = self.__channels[worker].recv(OCCUPANCY.size)
+        except OSError:
+            report = b''
+
+        if len(report) != OCCUPANCY.size:
+            self.__retire_worker(worker)
+            return
+
+        self.__occupancy[worker], = OCCUPANCY.unpack(report)
+
+    def __retire_worker(self, worker: int) -> None:
+        """Cesse d'envoyer des connexions à un processus de travail arrêté (il est considéré plein)."""
+        print(f"ERROR: worker {worker} stopped")
+        try:
+            self.__selector.unregister(self.__channels[worker])
+        except (KeyError, ValueError):
+            pass
+        self.__occupancy[worker] = self.__capacity
+
+    def get_port(self) -> int:
+        return self.__server_socket.getsockname()[1]
+
+    @property
+    def occupancy(self) -> list:
+        return self.__occupancy
+
+    def start(self) -> None:
+        """Crée les processus de travail et ouvre le socket d'écoute."""
+        context = multiprocessing.get_context('fork')
+        for worker in range(self.__worker_count):
+            channel, worker_channel = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            inherited = [self.__server_socket, *self.__channels, channel]
+            metrics_port = self.__metrics_port + worker if self.__metrics_port is not None else None
+            process = context.Process(target=run_worker, args=(worker_channel, inherited, *self.__worker_settings,
+                                                               metrics_port))
+            process.start()
+            worker_channel.close()
+
+            self.__channels.append(channel)
+            self.__occupancy.append(0)
+            self.__processes.append(process)
+            self.__selector.register(channel, selectors.EVENT_READ, worker)
+
+        self.__server_socket.listen(LISTEN_QUEUE)
+        self.__selector.register(self.__server_socket, selectors.EVENT_READ)
+
+    def run(self) -> None:
+        self.running = True
+        while self.running:
+            for key, _ in self.__selector.select(timeout=0.1):
+                if key.fileobj is self.__server_socket:
+                    self.__dispatch()
+                else:
+                    self.__read_occupancy(key.data)
+
+    def stop(self) -> None:
+        self.running = False
+        for channel in self.__channels:
+            channel.close()
+        for process in self.__processes:
+            process.join()
+        self.__selector.close()
+        self.__server_socket.close()
+        print("Supervisor closed")
@@ -1,116 +1,287 @@
+import base64
+import mmap
+import os
+import struct
+import time
+import zlib
+
+from array import array
+
 from network import NetMessage
 from tile import Tile
 from tile import TileType
 
 
+# Format compilé (levels/levelN.lvc): en-tête, positions de départ, sorties, puis un octet (code de tuile) par case.
+# Toutes les sections sont à taille fixe pour permettre la lecture directe du fichier projeté en mémoire (mmap).
+COMPILED_MAGIC = b'NVSL'
+COMPILED_VERSION = 1
+COMPILED_HEADER = struct.Struct('>4sBHHHHH')    # magic|version|numéro|largeur|hauteur|départs|sorties
+COMPILED_CELL = struct.Struct('>HH')            # x|y
+
+# Types des cases de départ, dans l'ordre des joueurs (le ninja, puis les samouraïs)
+STARTING_TILE_TYPES = (TileType.NINJA_START_POS, TileType.SAMOURAI_START_POS_1, TileType.SAMOURAI_START_POS_2,
+                       TileType.SAMOURAI_START_POS_3, TileType.SAMOURAI_START_POS_4, TileType.SAMOURAI_START_POS_5,
+                       TileType.SAMOURAI_START_POS_6)
+MIN_STARTING_POSITIONS = 7  # le ninja et les 6 samouraïs d'une partie; les positions manquantes sont (0, 0)
+
+
 class Level:
     """Niveau (grille) de jeu."""
+
+    DIRECTIONS = {'n': (0, -1), 's': (0, 1), 'e': (1, 0), 'w': (-1, 0)}   # direction (Player.get_facing): (dx, dy)
+
     def __init__(self) -> None:
         self.__number = 0
-        self.__tiles = []    # [[rangée],[rangée],[rangée],...]
+        self.__grid = bytearray()   # codes des tuiles (Tile.CODES_BY_SYMBOL), rangée par rangée
 
         self.__width = self.__height = 0
 
+        # Index des cases spéciales, construit au chargement
+        self.__starting_positions = []  # [(x, y)], le ninja puis les samouraïs
+        self.__exits = []               # [(x, y)]
+        self.__exit_cells = set()
+
+        # {direction: distance en cases jusqu'au prochain mur, pour chaque case}, calculées à la première demande
+        self.__wall_distances = {}
+
+        # Chaînes sérialisées (normale et compressée), calculées une seule fois par niveau chargé
+        self.__serialized = None
+        self.__compressed = None
+
+        self.load_time = 0.0    # durée (secondes) du dernier chargement ou de la dernière configuration
+
     def __str__(self) -> str:
-        level_string = str(self.__number).zfill(NetMessage.DATA_LVL_NUMBER_BYTES) + \
-                       str(self.__width).zfill(NetMessage.DATA_LVL_WIDTH_BYTES)
+        return self.serialize()
 
-        for row in self.__tiles:
-            for tile in row:
-                level_string += str(tile)
+    def serialize(self, compressed: bool = False) -> str:
+        """Retourne la chaîne descriptive du niveau (données de CMD_LVL), compressée au besoin."""
+        if self.__serialized is None:
+            self.__serialized = str(self.__number).zfill(NetMessage.DATA_LVL_NUMBER_BYTES) + \
+                                str(self.__width).zfill(NetMessage.DATA_LVL_WIDTH_BYTES) + \
+                                "".join(Tile.SYMBOLS[code] for code in self.__grid)
 
-        return level_string
+        if not compressed:
+            return self.__serialized
+
+        if self.__compressed is None:
+            packed = base64.b64encode(zlib.compress(self.__serialized.encode(), 9)).decode('ascii')
+            self.__compressed = NetMessage.DATA_LVL_COMPRESSED + packed
+        return self.__compressed
+
+    @staticmethod
+    def decompress(data: str) -> str or None:
+        """Retourne la chaîne descriptive d'un niveau compressé par serialize() (None si elle est invalide)."""
+        try:
+            return zlib.decompress(base64.b64decode(data[len(NetMessage.DATA_LVL_COMPRESSED):])).decode()
+        except (ValueError, zlib.error):
+            return None
 
     def get_starting_positions(self) -> list:
-        """Retourne les positions de départ de tous les joueurs (ninja et samouraïs)."""
-        positions = [{'x': 0, 'y': 0} for _ in range(7)]
-        index = 0
-        for y, row in enumerate(self.__tiles):
-            for x, tile in enumerate(row):
-
-                starting_position = True
-                if tile.tile_type == TileType.NINJA_START_POS:
-                    index = 0
-                elif tile.tile_type == TileType.SAMOURAI_START_POS_1:
-                    index = 1
-                elif tile.tile_type == TileType.SAMOURAI_START_POS_2:
-                    index = 2
-                elif tile.tile_type == TileType.SAMOURAI_START_POS_3:
-                    index = 3
-                elif tile.tile_type == TileType.SAMOURAI_START_POS_4:
-                    index = 4
-                elif tile.tile_type == TileType.SAMOURAI_START_POS_5:
-                    index = 5
-                elif tile.tile_type == TileType.SAMOURAI_START_POS_6:
-                    index = 6
-                else:
-                    starting_position = False
+        """
+            Retourne les positions de départ de tous les joueurs: le ninja, puis les samouraïs (les cases 1 à 6 dans
+            l'ordre, plusieurs cases d'un même numéro étant permises). Il y en a au moins MIN_STARTING_POSITIONS.
+        """
+        return [{'x': x, 'y': y} for x, y in self.__starting_positions]
+
+    @property
+    def exits(self) -> list:
+        """Retourne les positions (x, y) des sorties du niveau."""
+        return self.__exits
+
+    def is_exit(self, x, y: int) -> bool:
+        return (x, y) in self.__exit_cells
 
-                if starting_position:
-                    positions[index]['x'] = x
-                    positions[index]['y'] = y
+    def __index_special_tiles(self) -> None:
+        """Repère une seule fois (au chargement) les positions de départ et les sorties du niveau."""
+        cells = {}
+        for tile_type in (*STARTING_TILE_TYPES, TileType.EXIT):
+            code = bytes([Tile.CODES_BY_TYPE[tile_type]])
+            cells[tile_type] = []
+            cell = self.__grid.find(code)
+            while cell != -1:
+                cells[tile_type].append(divmod(cell, self.__width)[::-1])
+                cell = self.__grid.find(code, cell + 1)
 
-        return positions
+        ninja = cells[TileType.NINJA_START_POS][:1] or [(0, 0)]
+        samourais = [cell for tile_type in STARTING_TILE_TYPES[1:] for cell in cells[tile_type]]
+        self.__set_special_tiles(ninja + samourais, cells[TileType.EXIT])
+
+    def __set_special_tiles(self, starting_positions, exits: list) -> None:
+        missing = MIN_STARTING_POSITIONS - len(starting_positions)
+        self.__starting_positions = starting_positions + [(0, 0)] * max(missing, 0)
+        self.__exits = exits
+        self.__exit_cells = set(exits)
+
+    def __contains(self, x, y: int) -> bool:
+        return 0 <= x < self.__width and 0 <= y < self.__height
 
     def get_tile(self, x, y: int) -> Tile:
-        return self.__tiles[y][x]
+        return Tile.from_code(self.__grid[y * self.__width + x])
+
+    def is_walkable(self, x, y: int) -> bool:
+        """Indique si la case peut être occupée par un joueur (faux à l'extérieur du niveau)."""
+        return self.__contains(x, y) and bool(Tile.WALKABLE_BY_CODE[self.__grid[y * self.__width + x]])
+
+    def is_wall(self, x, y: int) -> bool:
+        """Indique si la case est un mur (l'extérieur du niveau compte comme un mur)."""
+        return not self.__contains(x, y) or self.__grid[y * self.__width + x] == Tile.WALL_CODE
+
+    def wall_distance(self, x, y: int, facing: str) -> int:
+        """
+            Retourne le nombre de pas jusqu'au premier mur (ou le bord du niveau) dans une direction ('n', 's', 'e',
+            'w'): les cases à 1 .. distance - 1 pas de (x, y) sont libres de murs.
+        """
+        distances = self.__wall_distances.get(facing)
+        if distances is None:
+            distances = self.__wall_distances[facing] = self.__compute_wall_distances(*self.DIRECTIONS[facing])
+        return distances[y * self.__width + x]
+
+    def __compute_wall_distances(self, delta_x, delta_y: int) -> array:
+        """Calcule la table d'une direction en une passe, en partant du côté vers lequel elle pointe."""
+        distances = array('H', bytes(2 * self.__width * self.__height))
+        columns = range(self.__width - 1, -1, -1) if delta_x > 0 else range(self.__width)
+        rows = range(self.__height - 1, -1, -1) if delta_y > 0 else range(self.__height)
+
+        for y in rows:
+            for x in columns:
+                next_x = x + delta_x
+                next_y = y + delta_y
+                if self.is_wall(next_x, next_y):
+                    distances[y * self.__width + x] = 1
+                else:
+                    distances[y * self.__width + x] = distances[next_y * self.__width + next_x] + 1
+
+        return distances
 
     def load(self, number: int) -> bool:
-        """Charge un niveau à partir d'un fichier texte."""
+        """Charge un niveau à partir de sa version compilée si elle est à jour, sinon du fichier texte (puis la compile)."""
+        start = time.perf_counter()
 
         self.__number = number
+        self.__serialized = self.__compressed = None
+        self.__wall_distances.clear()
         filename = "levels/level" + str(self.__number) + ".txt"
+        compiled_filename = "levels/level" + str(self.__number) + ".lvc"
 
+        source = "compiled"
+        if not self.__is_compiled_fresh(filename, compiled_filename) or not self.__load_compiled(compiled_filename):
+            source = "text"
+            try:
+                with open(filename, "rb") as level_file:
+                    if not self.__parse_rows(line.rstrip(b'\r\n') for line in level_file):
+                        return False
+            except FileNotFoundError:
+                print("File not found : " + filename)
+                return False
+            self.__index_special_tiles()
+            self.__save_compiled(compiled_filename)
+
+        self.load_time = time.perf_counter() - start
+        print(f"Level {self.__number} ({self.__width}x{self.__height}) loaded from {source} file "
+              f"in {self.load_time * 1000:.2f} ms")
+        return True
+
+    @staticmethod
+    def __is_compiled_fresh(filename, compiled_filename: str) -> bool:
+        """Le fichier compilé est utilisable s'il existe et n'est pas plus ancien que le fichier texte."""
         try:
-            with open(filename, "r") as level_file:
-                level_str = level_file.read()
-                valid_characters = self.__validate_level_characters(level_str)
-                if valid_characters:
-                    level_lines = level_str.splitlines()
-                    line_length = len(level_lines[0])
-                    for line in level_lines:
-                        if line_length != len(line):
-                            print("The lines in the level file are not the same length")
-                            return False
-                        line_length = len(line)
-                        symbols = line.strip()
-                        columns = []
-                        for symbol in symbols:
-                            tile = Tile.create_from_symbol(symbol)
-                            columns.append(tile)
-                        self.__tiles.append(columns)
-                else:
-                    print("The level contains invalid characters")
+            compiled_mtime = os.stat(compiled_filename).st_mtime_ns
+        except OSError:
+            return False
+        try:
+            return compiled_mtime >= os.stat(filename).st_mtime_ns
+        except OSError:
+            return True     # niveau distribué sans sa source texte
+
+    def __load_compiled(self, compiled_filename: str) -> bool:
+        """Charge un niveau compilé par projection en mémoire. Retourne False si le fichier est invalide."""
+        try:
+            with open(compiled_filename, "rb") as compiled_file, \
+                    mmap.mmap(compiled_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                magic, version, number, width, height, start_count, exit_count = COMPILED_HEADER.unpack_from(data)
+                if magic != COMPILED_MAGIC or version != COMPILED_VERSION or number != self.__number:
+                    return False
+
+                offset = COMPILED_HEADER.size
+                cells = [COMPILED_CELL.unpack_from(data, offset + index * COMPILED_CELL.size)
+                         for index in range(start_count + exit_count)]
+                offset += len(cells) * COMPILED_CELL.size
+                if len(data) != offset + width * height:
                     return False
-        except FileNotFoundError:
-            print("File not found : " + filename)
+
+                self.__grid = bytearray(data[offset:])
+        except (OSError, ValueError, struct.error):
             return False
 
-        self.__width = len(self.__tiles[0])
-        self.__height = len(self.__tiles)
+        self.__width = width
+        self.__height = height
+        self.__set_special_tiles(cells[:start_count], cells[start_count:])
+        return True
+
+    def __save_compiled(self, compiled_filename: str) -> None:
+        """Écrit la version compilée du niveau (remplacée d'un coup pour ne jamais laisser un fichier partiel)."""
+        cells = self.__starting_positions + self.__exits
+
+        temporary_filename = compiled_filename + ".tmp"
+        try:
+            with open(temporary_filename, "wb") as compiled_file:
+                compiled_file.write(COMPILED_HEADER.pack(COMPILED_MAGIC, COMPILED_VERSION, self.__number, self.__width,
+                                                         self.__height, len(self.__starting_positions),
+                                                         len(self.__exits)))
+                for cell in cells:
+                    compiled_file.write(COMPILED_CELL.pack(*cell))
+                compiled_file.write(self.__grid)
+            os.replace(temporary_filename, compiled_filename)
+        except OSError:
+            print("WARNING: failed to write compiled level " + compiled_filename)
+
+    def __parse_rows(self, rows) -> bool:
+        """
+            Construit la grille en une seule passe à partir des rangées de symboles (octets) d'un itérateur:
+            les rangées sont accumulées telles quelles puis validées et converties en codes par une table de traduction.
+        """
+        symbols = bytearray()
+        width = height = 0
+        for row in rows:
+            if height and len(row) != width:
+                print("The lines in the level file are not the same length")
+                return False
+            width = len(row)
+            symbols += row
+            height += 1
+
+        grid = symbols.translate(Tile.CODES_TABLE)
+        if not height or Tile.INVALID_CODE in grid:
+            print("The level contains invalid characters")
+            return False
+
+        self.__grid = grid
+        self.__width = width
+        self.__height = height
         return True
-    
-    def __validate_level_characters(self, level_file: str) -> bool:
-        """Valider que seulement les caracteres permis sont dans le fichier de niveau"""
-        types_and_symbols = Tile.TYPES_AND_SYMBOLS
-        allowed = set(types_and_symbols.keys())
-        allowed.add('\n')
-        return set(level_file) <= allowed
 
     def setup_from_data(self, number, width, height: int, data: str) -> None:
         """Configure un niveau à partir d'une chaîne de caractères (data) descriptive."""
+        start = time.perf_counter()
+
         self.__number = number
         self.__width = width
         self.__height = height
+        self.__serialized = self.__compressed = None
+        self.__wall_distances.clear()
 
-        while len(data):
-            symbols = data[:width]
-            columns = []
-            for symbol in symbols:
-                tile = Tile.create_from_symbol(symbol)
-                columns.append(tile)
-            self.__tiles.append(columns)
-            data = data[width:]
+        # Un caractère par case; les symboles inconnus deviennent du sol
+        grid = data.encode('latin-1', errors='replace').translate(Tile.CODES_TABLE)
+        self.__grid = bytearray(grid.replace(bytes([Tile.INVALID_CODE]), bytes([Tile.GROUND_CODE])))
+        self.__index_special_tiles()
+
+        self.load_time = time.perf_counter() - start
+
+    @property
+    def grid(self) -> memoryview:
+        """Codes des tuiles (un octet par case, rangée par rangée), en lecture seule."""
+        return memoryview(self.__grid).toreadonly()
 
     @property
     def height(self) -> int:
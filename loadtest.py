@@ -0,0 +1,226 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+
+from datetime import datetime
+from datetime import timezone
+
+from game import Game
+from game_room import PLAYERS_PER_ROOM
+from game_server import GameServer
+from network import NetCodec
+from network import NetMessage
+from network import NetSelectorServer
+from network import NetServer
+from ninja_vs_samourais_bots import MOVING_PACE
+from ninja_vs_samourais_bots import RandomPolicy
+from ninja_vs_samourais_bots import run_bot
+from tick_scheduler import DEFAULT_TICK_RATE
+from tick_scheduler import TickScheduler
+
+
+def run_server(channel, matches: int, server_type: str, snapshot: bool, tick_rate: float) -> None:
+    """
+        Processus du serveur sous test: un GameServer local sur un port libre. Transmet son port, puis, à la demande
+        d'arrêt, ses mesures (temps CPU, ticks, messages retirés des files d'envoi).
+    """
+    max_sessions = matches * PLAYERS_PER_ROOM
+    if server_type == 'selector':
+        network_server = NetSelectorServer('127.0.0.1', 0, max_sessions, announce_sessions=False)
+    else:
+        network_server = NetServer('127.0.0.1', 0, max_sessions, announce_sessions=False)
+    game_server = GameServer(network_server=network_server, snapshot=snapshot, max_rooms=matches)
+    scheduler = TickScheduler(tick_rate)
+
+    game = Game()
+    if not game.next_level():
+        channel.send(None)
+        return
+
+    game_server.start()
+    channel.send(game_server.get_port())
+
+    def check_for_stop() -> None:
+        if channel.poll():
+            channel.recv()
+            scheduler.stop()
+
+    scheduler.add_task(lambda: game_server.handle_messages(game))
+    scheduler.add_task(game_server.send_snapshots)
+    scheduler.add_task(check_for_stop)
+
+    cpu_start = time.process_time()
+    scheduler.run()
+    cpu_seconds = time.process_time() - cpu_start
+
+    channel.send({'cpu_seconds': cpu_seconds, 'ticks': scheduler.ticks, 'tick_overruns': scheduler.overruns,
+                  'ticks_skipped': scheduler.skipped, 'dropped_messages': game_server.dropped_messages})
+    game_server.stop()
+
+
+class LoadTestStats:
+    """
+        Mesures partagées par tous les clients du test de charge (une seule boucle asyncio, donc sans verrou).
+        Les positions envoyées ne sont pas modifiées (elles restent compactes en binaire): l'heure d'envoi de chacune
+        est plutôt conservée ici, où tous les clients du processus la retrouvent à la réception.
+    """
+
+    def __init__(self) -> None:
+        self.messages_sent = self.messages_received = 0
+        self.positions_sent = 0
+        self.positions_relayed = 0
+        self.latencies = []         # secondes, d'un client à l'autre en passant par le serveur
+        self.network_clients = []   # sessions asyncio dont le transport compte les octets
+
+        self.__sent_positions = {}  # {(joueur, xxxyyyf): (heure d'envoi, clients qui l'ont déjà reçue)}
+
+    def position_sent(self, source: str, data: str) -> None:
+        self.positions_sent += 1
+        self.__sent_positions[(source, data)] = (time.perf_counter(), set())
+
+    def position_received(self, receiver, source: str, data: str, now: float) -> None:
+        """Mesure le délai d'une position à sa première réception par un client (relais ou instantané)."""
+        sent = self.__sent_positions.get((source, data))
+        if sent and receiver not in sent[1]:
+            sent[1].add(receiver)
+            self.positions_relayed += 1
+            self.latencies.append(now - sent[0])
+
+    def summary(self, duration: float, relay_fanout: int or None) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction: float) -> float or None:
+            if not latencies:
+                return None
+            return round(latencies[min(int(fraction * len(latencies)), len(latencies) - 1)] * 1000, 3)
+
+        bytes_sent = sum(client.session_ctrl.bytes_sent for client in self.network_clients)
+        bytes_received = sum(client.session_ctrl.bytes_received for client in self.network_clients)
+
+        # En mode relais, chaque position doit parvenir aux autres joueurs de la salle. En mode instantané, seule
+        # la dernière position de chaque joueur à chaque tick est transmise: les autres ne sont pas des pertes.
+        expected = self.positions_sent * relay_fanout if relay_fanout else None
+        return {
+            'messages_sent': self.messages_sent,
+            'messages_received': self.messages_received,
+            'messages_per_second': round((self.messages_sent + self.messages_received) / duration, 1),
+            'bytes_sent': bytes_sent,
+            'bytes_received': bytes_received,
+            'bytes_per_second': round((bytes_sent + bytes_received) / duration, 1),
+            'positions_sent': self.positions_sent,
+            'positions_relayed': self.positions_relayed,
+            'positions_missing': expected - self.positions_relayed if expected is not None else None,
+            'latency_ms': {'samples': len(latencies), 'p50': percentile(0.5), 'p90': percentile(0.9),
+                           'p99': percentile(0.99), 'max': percentile(1.0)},
+        }
+
+
+class MeasuringNetClient:
+    """
+        S'intercale entre un GameClient et son client réseau asyncio: compte les messages, note l'heure d'envoi des
+        positions et mesure le délai de celles qui sont reçues des autres joueurs (relayées ou dans un instantané).
+    """
+
+    def __init__(self, network_client, stats: LoadTestStats) -> None:
+        self.__network_client = network_client
+        self.__stats = stats
+        stats.network_clients.append(network_client)
+
+    def __getattr__(self, name: str):
+        return getattr(self.__network_client, name)
+
+    def receive(self) -> list:
+        messages = self.__network_client.receive()
+        now = time.perf_counter()
+        stats = self.__stats
+        stats.messages_received += len(messages)
+        for message in messages:
+            data = message.data
+            if message.is_position():
+                stats.position_received(self, message.source, data, now)
+            elif message.is_snapshot():
+                entry_bytes = NetMessage.DATA_SNAPSHOT_ENTRY_BYTES
+                for offset in range(0, len(data) - entry_bytes + 1, entry_bytes):
+                    source_end = offset + NetMessage.SRC_BYTES
+                    stats.position_received(self, data[offset:source_end], data[source_end:offset + entry_bytes],
+                                            now)
+        return messages
+
+    def send(self, message: NetMessage) -> None:
+        if message.is_position():
+            self.__stats.position_sent(message.source, message.data)
+        self.__stats.messages_sent += 1
+        self.__network_client.send(message)
+
+
+async def run_clients(port: int, args, stats: LoadTestStats) -> list:
+    """Connecte matches x 7 joueurs (dans l'ordre des salles) qui se déplacent au hasard sans attaquer."""
+    bots = []
+    player_count = args.matches * PLAYERS_PER_ROOM
+    for index in range(player_count):
+        policy = RandomPolicy(seed=args.seed + index, attack=False)
+        bots.append(run_bot('127.0.0.1', port, policy, args.codec, args.duration, index * args.ramp_up / player_count,
+                            1 / args.move_rate,
+                            lambda network_client: MeasuringNetClient(network_client, stats)))
+    return await asyncio.gather(*bots)
+
+
+def main() -> None:
+    """Test de charge: un serveur local, des parties complètes de joueurs simulés, et un rapport JSON."""
+    parser = argparse.ArgumentParser(description="Ninja VS Samouraïs load test")
+    parser.add_argument('--matches', type=int, default=4, help="nombre de parties de 7 joueurs")
+    parser.add_argument('--duration', type=float, default=20.0, help="durée des parties (secondes)")
+    parser.add_argument('--move-rate', type=float, default=1 / MOVING_PACE,
+                        help="déplacements par seconde de chaque joueur")
+    parser.add_argument('--ramp-up', type=float, default=1.0, help="délai (secondes) pour connecter tous les joueurs")
+    parser.add_argument('--server', choices=['threads', 'selector'], default='selector')
+    parser.add_argument('--snapshot', action='store_true')
+    parser.add_argument('--tick-rate', type=float, default=DEFAULT_TICK_RATE)
+    parser.add_argument('--codec', choices=[NetCodec.TEXT, NetCodec.BINARY], default=NetCodec.BINARY)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='loadtest_results.json', help="fichier JSON du rapport")
+    args = parser.parse_args()
+
+    channel, server_channel = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=run_server, args=(server_channel, args.matches, args.server,
+                                                              args.snapshot, args.tick_rate))
+    server.start()
+    port = channel.recv()
+    if port is None:
+        server.join()
+        return
+
+    stats = LoadTestStats()
+    started = time.perf_counter()
+    asyncio.run(run_clients(port, args, stats))
+    duration = time.perf_counter() - started
+
+    channel.send('stop')
+    server_stats = channel.recv()
+    server.join()
+
+    server_stats['cpu_percent'] = round(server_stats['cpu_seconds'] / duration * 100, 1)
+    report = {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'config': vars(args),
+        'duration_seconds': round(duration, 3),
+        'clients': stats.summary(duration, None if args.snapshot else PLAYERS_PER_ROOM - 1),
+        'latency_measured_on': 'snapshots' if args.snapshot else 'relayed positions',
+        'server': server_stats,
+    }
+
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+
+    clients = report['clients']
+    latency = clients['latency_ms']
+    print(f"{clients['messages_per_second']} msg/s, {clients['bytes_per_second']} B/s, "
+          f"server CPU {server_stats['cpu_percent']}%, latency p50 {latency['p50']} ms p99 {latency['p99']} ms, "
+          f"{server_stats['dropped_messages']} dropped, {clients['positions_missing']} missing")
+    print("Report written to " + args.output)
+
+
+if __name__ == '__main__':
+    main()
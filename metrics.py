@@ -0,0 +1,239 @@
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+from tick_scheduler import DurationHistogram
+
+
+METRICS_HOST = '127.0.0.1'     # le point d'accès n'est offert qu'à la machine locale
+METRICS_PORT = 9150
+
+
+class _PerThread:
+    """
+        Valeurs d'une mesure réparties par tâche: chaque tâche ne modifie que les siennes, sans verrou.
+        Les valeurs des tâches terminées sont regroupées à la lecture pour ne pas s'accumuler.
+    """
+
+    def __init__(self, create) -> None:
+        self.__create = create
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__shards = []      # [(tâche, valeurs)]
+        self.__retired = create()   # valeurs des tâches terminées
+
+    def local(self):
+        try:
+            return self.__local.values
+        except AttributeError:
+            values = self.__local.values = self.__create()
+            with self.__lock:
+                self.__shards.append((threading.current_thread(), values))
+            return values
+
+    def collect(self, merge):
+        """Regroupe les valeurs de toutes les tâches avec merge(source, cible) et retourne le total."""
+        total = self.__create()
+        with self.__lock:
+            for thread, values in [shard for shard in self.__shards if not shard[0].is_alive()]:
+                self.__shards.remove((thread, values))
+                merge(values, self.__retired)
+            merge(self.__retired, total)
+            for _, values in self.__shards:
+                merge(values, total)
+        return total
+
+
+class Counter:
+    """Compteur croissant, global ou par étiquette (ex.: la commande d'un message)."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str, label: str = None) -> None:
+        self.name = name
+        self.description = description
+        self.label = label
+        self.__values = _PerThread(dict)
+
+    def inc(self, amount: int = 1, label: str = '') -> None:
+        values = self.__values.local()
+        values[label] = values.get(label, 0) + amount
+
+    def values(self) -> dict:
+        """Retourne les totaux de toutes les tâches, par étiquette ('' sans étiquette)."""
+        def merge(values: dict, totals: dict) -> None:
+            for label, value in values.copy().items():
+                totals[label] = totals.get(label, 0) + value
+
+        return self.__values.collect(merge)
+
+    def snapshot(self) -> dict:
+        values = self.values()
+        if self.label:
+            return {'type': self.kind, 'description': self.description, 'label': self.label, 'values': values}
+        return {'type': self.kind, 'description': self.description, 'value': values.get('', 0)}
+
+
+class Gauge:
+    """Valeur instantanée, fixée par set() ou calculée à la lecture par function (ex.: profondeur des files)."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, description: str, function=None) -> None:
+        self.name = name
+        self.description = description
+        self.function = function
+        self.__value = 0
+
+    def set(self, value: float) -> None:
+        self.__value = value
+
+    def value(self) -> float:
+        return self.function() if self.function else self.__value
+
+    def snapshot(self) -> dict:
+        return {'type': self.kind, 'description': self.description, 'value': self.value()}
+
+
+class Histogram:
+    """Histogramme de durées (secondes) à seuils fixes en millisecondes, tenu par tâche (voir DurationHistogram)."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, buckets_ms: tuple = DurationHistogram.BUCKETS_MS) -> None:
+        self.name = name
+        self.description = description
+        self.buckets_ms = buckets_ms
+        self.__histograms = _PerThread(lambda: DurationHistogram(buckets_ms))
+
+    def record(self, seconds: float) -> None:
+        self.__histograms.local().record(seconds)
+
+    def histogram(self) -> DurationHistogram:
+        """Retourne un histogramme qui regroupe les mesures de toutes les tâches."""
+        def merge(histogram: DurationHistogram, total: DurationHistogram) -> None:
+            total.counts = [mine + theirs for mine, theirs in zip(total.counts, histogram.counts)]
+            total.count += histogram.count
+            total.total += histogram.total
+            total.max = max(total.max, histogram.max)
+
+        return self.__histograms.collect(merge)
+
+    def snapshot(self) -> dict:
+        histogram = self.histogram()
+        return {'type': self.kind, 'description': self.description,
+                'buckets_ms': dict(zip(map(str, self.buckets_ms + ('+Inf',)), histogram.counts)),
+                'count': histogram.count, 'sum': histogram.total, 'max': histogram.max}
+
+
+class MetricsRegistry:
+    """
+        Ensemble nommé de compteurs, jauges et histogrammes d'un processus.
+        Les chemins critiques ne font qu'incrémenter des valeurs locales à leur tâche; tout le travail
+        d'agrégation est fait à la lecture (snapshot, to_text).
+    """
+
+    def __init__(self, prefix: str = 'nvs_') -> None:
+        self.prefix = prefix
+        self.__metrics = {}
+        self.__lock = threading.Lock()
+
+    def __get_or_create(self, kind, name: str, *args):
+        with self.__lock:
+            metric = self.__metrics.get(name)
+            if metric is None:
+                metric = self.__metrics[name] = kind(name, *args)
+            elif not isinstance(metric, kind):
+                raise ValueError(f"Metric {name} already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, description: str, label: str = None) -> Counter:
+        return self.__get_or_create(Counter, name, description, label)
+
+    def gauge(self, name: str, description: str, function=None) -> Gauge:
+        """Retourne la jauge name; function, si fournie, remplace la fonction de lecture actuelle."""
+        gauge = self.__get_or_create(Gauge, name, description)
+        if function:
+            gauge.function = function
+        return gauge
+
+    def histogram(self, name: str, description: str, buckets_ms: tuple = DurationHistogram.BUCKETS_MS) -> Histogram:
+        return self.__get_or_create(Histogram, name, description, buckets_ms)
+
+    def snapshot(self) -> dict:
+        """Retourne toutes les mesures sous forme de dictionnaire (sérialisable en JSON)."""
+        with self.__lock:
+            metrics = list(self.__metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def to_text(self) -> str:
+        """Retourne toutes les mesures au format texte de Prometheus."""
+        lines = []
+        for name, metric in self.snapshot().items():
+            name = self.prefix + name
+            lines.append(f"# HELP {name} {metric['description']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            if metric['type'] == 'histogram':
+                cumulative = 0
+                for bucket, count in metric['buckets_ms'].items():
+                    cumulative += count
+                    bound = bucket if bucket == '+Inf' else f"{int(bucket) / 1000:g}"
+                    lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum {metric['sum']:.6f}")
+                lines.append(f"{name}_count {metric['count']}")
+            elif 'values' in metric:
+                for label, value in sorted(metric['values'].items()):
+                    lines.append(f'{name}{{{metric["label"]}="{label}"}} {value}')
+            else:
+                lines.append(f"{name} {metric['value']}")
+        return "\n".join(lines) + "\n"
+
+
+# Registre du processus, partagé par la couche réseau et le serveur de jeu
+METRICS = MetricsRegistry()
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """/metrics: format texte; /metrics.json: JSON."""
+
+    def do_GET(self) -> None:
+        registry = self.server.registry
+        if self.path in ('/', '/metrics'):
+            body, content_type = registry.to_text().encode(), 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/metrics.json':
+            body, content_type = json.dumps(registry.snapshot(), indent=2).encode(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """Les lectures périodiques ne sont pas journalisées."""
+
+
+class MetricsServer:
+    """Petit serveur HTTP local qui publie un registre de mesures, dans une tâche de fond."""
+
+    def __init__(self, registry: MetricsRegistry = METRICS, host: str = METRICS_HOST, port: int = METRICS_PORT) -> None:
+        self.__http_server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+        self.__http_server.daemon_threads = True
+        self.__http_server.registry = registry
+        self.__thread = threading.Thread(target=self.__http_server.serve_forever, daemon=True)
+
+    def get_port(self) -> int:
+        return self.__http_server.server_address[1]
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__http_server.shutdown()
+        self.__thread.join()
+        self.__http_server.server_close()
@@ -1,30 +1,59 @@
+import os
 import select
+import selectors
 import socket
+import struct
 import sys
 import threading
 
+from collections import deque
 from queue import Empty, Queue
 
+from metrics import METRICS
+
 
 MAX_RX_QSIZE = 10
-MAX_TX_QSIZE = 10
 LISTEN_QUEUE = 5
+RECV_SIZE = 4096
+RX_BUFFER_SIZE = 16384
+
+# Mesures de la couche réseau (comptées par tâche, regroupées à la lecture: voir metrics.py)
+MESSAGES_RECEIVED = METRICS.counter('messages_received_total', "Messages reçus, par commande", 'command')
+MESSAGES_SENT = METRICS.counter('messages_sent_total', "Messages transmis, par commande", 'command')
+BYTES_RECEIVED = METRICS.counter('bytes_received_total', "Octets des trames reçues")
+BYTES_SENT = METRICS.counter('bytes_sent_total', "Octets des trames transmises")
+PARSE_ERRORS = METRICS.counter('parse_errors_total', "Trames reçues rejetées (impossibles à décoder)")
+DROPPED_MESSAGES = METRICS.counter('dropped_messages_total',
+                                   "Positions et instantanés remplacés (ou fusionnés) dans une file d'envoi")
+
+
+class NetCodec:
+    """Formats de trame supportés sur le réseau."""
+    TEXT = 'text'
+    BINARY = 'binary'
 
 
 class NetSettings:
     SERVER_HOST = '0.0.0.0'
     SERVER_PORT = 20000
+    CODEC = NetCodec.TEXT
+    MAX_SESSIONS = 7
 
 
 class NetMessage:
     """
         Messages échangés entre les clients et le serveur.
-        Format: commande|source|destination|longueur des données|données
+        Format texte: commande|source|destination|longueur des données|données
+        Format binaire: 0x80+id commande(1)|source(1)|destination(1)|longueur varint|données
+            (les positions xxxyyyf sont compactées en x(2)|y(2)|direction(1), bit 0x40 de la commande)
 
         Données pour...
             CMD_SID: identifiant de session(2)
-            CMD_POS: x(3)|y(3)
+            CMD_POS: x(3)|y(3)|direction(1)
             CMD_LVL: numéro de niveau(2)|largeur(3)|chaîne de niveau(n)
+                     ou 'z'|chaîne précédente compressée (zlib) et encodée en base64, si la demande contenait 'z'
+            CMD_SNP: [joueur(2)|x(3)|y(3)|direction(1)] pour chaque joueur qui s'est déplacé
+            CMD_UDP: port UDP du serveur(5)|jeton de session(n)
     """
     CMD_BYTES = 3
     SRC_BYTES = 2
@@ -41,14 +70,21 @@ class NetMessage:
 
     CMD = {'sessionID': 'SID', 'position': 'POS', 'level': 'LVL',
            'active': 'ACT', 'players': 'PLL', 'close': 'CLO', 'hit': 'HIT', 'queryPosition': 'QPO',
-           'endGame': 'END'}
+           'endGame': 'END', 'snapshot': 'SNP', 'udp': 'UDP'}
+
+    # Identifiants des commandes pour le format binaire (ajouter les nouvelles commandes à la fin)
+    CMD_IDS = {cmd: cmd_id for cmd_id, cmd in enumerate(CMD.values())}
+    CMD_BY_ID = {cmd_id: cmd for cmd, cmd_id in CMD_IDS.items()}
 
     DATA_POS_BYTES = 3
+    DATA_SNAPSHOT_ENTRY_BYTES = SRC_BYTES + DATA_POS_BYTES * 2 + 1
+    DATA_UDP_PORT_BYTES = 5
     DATA_ATK_BYTES = 2
     DATA_TARGET_BYTES = 2
 
     DATA_LVL_NUMBER_BYTES = 2
     DATA_LVL_WIDTH_BYTES = 3
+    DATA_LVL_COMPRESSED = 'z'
 
     SRC_UNDEFINED = '98'
     SRC_SERVER = '99'
@@ -63,6 +99,11 @@ class NetMessage:
         self.__destination = destination
         self.__data = data
 
+        # Côté serveur: identifiant de la session (connexion) qui a reçu le message. Ne fait pas partie de la trame.
+        self.session = None
+        # Vrai pour un message créé par la couche réseau elle-même (jamais pour un message décodé d'une trame)
+        self.local = False
+
     def copy(self):
         """Retourne une copie du message."""
         return NetMessage(self.command, self.source, self.destination, self.data)
@@ -94,6 +135,12 @@ class NetMessage:
     def is_end_game(self) -> bool:
         return self.__command == self.CMD['endGame']
 
+    def is_snapshot(self) -> bool:
+        return self.__command == self.CMD['snapshot']
+
+    def is_udp_offer(self) -> bool:
+        return self.__command == self.CMD['udp']
+
     @property
     def command(self) -> str:
         return self.__command
@@ -119,6 +166,179 @@ def message2data(message: NetMessage) -> str:
             NetMessage.DATA_LENGTH_BYTES) + message.data
 
 
+BINARY_FLAG = 0x80
+BINARY_PACKED_POSITION_FLAG = 0x40
+BINARY_CMD_MASK = 0x3F
+
+BINARY_HEADER = struct.Struct('>BBB')
+BINARY_SHORT_HEADER = struct.Struct('>BBBB')    # en-tête et longueur de moins de 128 octets (varint d'un octet)
+BINARY_PACKED_POSITION = struct.Struct('>BBBBHHB')
+BINARY_PACKED_POSITION_LENGTH = BINARY_PACKED_POSITION.size - BINARY_HEADER.size - 1
+BINARY_MAX_POSITION = 10 ** NetMessage.DATA_POS_BYTES - 1   # une coordonnée tient en DATA_POS_BYTES chiffres
+
+# Tables de conversion entre les champs texte des messages et leurs valeurs binaires: une recherche remplace
+# isdigit/int à l'encodage et str/zfill au décodage (une recherche ratée signale aussi un champ invalide).
+_ID_STRINGS = tuple(str(value).zfill(NetMessage.SRC_BYTES) for value in range(256))
+_ID_VALUES = {string: value for value, string in enumerate(_ID_STRINGS)}
+_POSITION_STRINGS = tuple(str(value).zfill(NetMessage.DATA_POS_BYTES) for value in range(BINARY_MAX_POSITION + 1))
+_POSITION_VALUES = {string: value for value, string in enumerate(_POSITION_STRINGS)}
+_POSITION_COMMAND = NetMessage.CMD['position']
+
+
+def _encode_varint(value: int) -> bytes:
+    """Encode un entier positif en varint (7 bits par octet, bit de poids fort = continuation)."""
+    encoded = bytearray()
+    while value >= 0x80:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _decode_varint(buffer, offset: int) -> tuple:
+    """Décode un varint à partir de offset. Retourne (valeur, offset suivant) ou (None, 0) si incomplet."""
+    value = shift = 0
+    while offset < len(buffer):
+        byte = buffer[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+    return None, 0
+
+
+def message2binary(message: NetMessage) -> bytes:
+    """Transforme un message en trame binaire (COMMAND|SRC|DEST|VARINT LENGTH|DATA) à transmettre sur le réseau."""
+    command = message.command
+    cmd_id = NetMessage.CMD_IDS[command] | BINARY_FLAG
+    src = _ID_VALUES.get(message.source)
+    if src is None:
+        src = int(message.source)
+    dest = _ID_VALUES.get(message.destination)
+    if dest is None:
+        dest = int(message.destination)
+
+    data = message.data
+    if command == _POSITION_COMMAND and len(data) == 7:
+        x = _POSITION_VALUES.get(data[:3])
+        y = _POSITION_VALUES.get(data[3:6])
+        facing = ord(data[6])
+        if x is not None and y is not None and facing < 0x80:
+            return BINARY_PACKED_POSITION.pack(cmd_id | BINARY_PACKED_POSITION_FLAG, src, dest,
+                                               BINARY_PACKED_POSITION_LENGTH, x, y, facing)
+
+    data = data.encode()
+    if len(data) < 0x80:
+        return BINARY_SHORT_HEADER.pack(cmd_id, src, dest, len(data)) + data
+    return BINARY_HEADER.pack(cmd_id, src, dest) + _encode_varint(len(data)) + data
+
+
+def binary2message(buffer, offset: int = 0) -> tuple:
+    """
+        Transforme une trame binaire reçue du réseau en message.
+        Retourne (message, longueur de la trame), (None, 0) si la trame est incomplète
+        ou (None, nombre d'octets à rejeter) si la trame est invalide.
+    """
+    remaining = len(buffer) - offset
+    if remaining < BINARY_HEADER.size + 1:
+        return None, 0
+
+    cmd_byte = buffer[offset]
+    cmd = NetMessage.CMD_BY_ID.get(cmd_byte & BINARY_CMD_MASK)
+    if not cmd_byte & BINARY_FLAG or cmd is None:
+        return None, remaining
+
+    if cmd_byte & BINARY_PACKED_POSITION_FLAG:
+        if remaining < BINARY_PACKED_POSITION.size:
+            return None, 0
+        _, src, dest, _, x, y, facing = BINARY_PACKED_POSITION.unpack_from(buffer, offset)
+        if facing & 0x80 or x > BINARY_MAX_POSITION or y > BINARY_MAX_POSITION:
+            return None, BINARY_PACKED_POSITION.size
+        data = _POSITION_STRINGS[x] + _POSITION_STRINGS[y] + chr(facing)
+        return NetMessage(cmd, _ID_STRINGS[src], _ID_STRINGS[dest], data), BINARY_PACKED_POSITION.size
+
+    _, src, dest, data_length = BINARY_SHORT_HEADER.unpack_from(buffer, offset)
+    data_offset = offset + BINARY_SHORT_HEADER.size
+    if data_length & 0x80:
+        data_length, data_offset = _decode_varint(buffer, offset + BINARY_HEADER.size)
+        if data_length is None:
+            return None, 0
+
+    frame_end = data_offset + data_length
+    if len(buffer) < frame_end:
+        return None, 0
+
+    try:
+        data = bytes(buffer[data_offset:frame_end]).decode()
+    except UnicodeDecodeError:
+        return None, frame_end - offset
+
+    return NetMessage(cmd, _ID_STRINGS[src], _ID_STRINGS[dest], data), frame_end - offset
+
+
+def text2message(buffer, offset: int = 0) -> tuple:
+    """Équivalent de data2message pour une trame texte dans un tampon d'octets. Même retour que binary2message."""
+    remaining = len(buffer) - offset
+    if remaining < NetMessage.HEADER_BYTES:
+        return None, 0
+
+    try:
+        header = bytes(buffer[offset:offset + NetMessage.HEADER_BYTES]).decode('ascii')
+    except UnicodeDecodeError:
+        return None, remaining
+
+    src = header[NetMessage.SRC_OFFSET:NetMessage.SRC_OFFSET + NetMessage.SRC_BYTES]
+    dest = header[NetMessage.DEST_OFFSET:NetMessage.DEST_OFFSET + NetMessage.DEST_BYTES]
+    data_length_str = header[NetMessage.DATA_LENGTH_OFFSET:]
+    if not src.isdigit() or not dest.isdigit() or not data_length_str.isdigit():
+        return None, remaining
+
+    cmd = header[NetMessage.CMD_OFFSET:NetMessage.CMD_OFFSET + NetMessage.CMD_BYTES]
+    if cmd not in NetMessage.CMD_IDS:
+        return None, remaining
+
+    frame_length = NetMessage.HEADER_BYTES + int(data_length_str)
+    if remaining < frame_length:
+        return None, 0
+
+    try:
+        data = bytes(buffer[offset + NetMessage.DATA_OFFSET:offset + frame_length]).decode()
+    except UnicodeDecodeError:
+        return None, frame_length
+
+    return NetMessage(cmd, src, dest, data), frame_length
+
+
+def decode_frame(buffer, offset: int = 0) -> tuple:
+    """Décode la trame (texte ou binaire, selon le premier octet) qui débute à offset."""
+    if offset >= len(buffer):
+        return None, 0
+    if buffer[offset] & BINARY_FLAG:
+        return binary2message(buffer, offset)
+    return text2message(buffer, offset)
+
+
+def encode_message(message: NetMessage, codec: str) -> bytes:
+    """Encode un message selon le format de trame demandé."""
+    if codec == NetCodec.BINARY:
+        return message2binary(message)
+
+    # La longueur est comptée en octets pour que les données non ASCII restent délimitées correctement.
+    data = message.data.encode()
+    header = message.command + message.source + message.destination + \
+        str(len(data)).zfill(NetMessage.DATA_LENGTH_BYTES)
+    return header.encode() + data
+
+
+def encode_outgoing(message: NetMessage, codec: str) -> bytes:
+    """Encode un message qui part sur le réseau et le compte dans les mesures d'envoi."""
+    frame = encode_message(message, codec)
+    MESSAGES_SENT.inc(1, message.command)
+    BYTES_SENT.inc(len(frame))
+    return frame
+
+
 def data2message(string: str) -> NetMessage or int or None:
     """Transforme une chaîne de caractères (COMMAND|DATA LENGTH|DATA) reçue du réseau en message."""
     if len(string) < NetMessage.HEADER_BYTES:
@@ -155,13 +375,84 @@ def data2message(string: str) -> NetMessage or int or None:
     return NetMessage(cmd, src, dest, data)
 
 
+def _merge_snapshots(pending: NetMessage, message: NetMessage) -> NetMessage:
+    """
+        Regroupe deux instantanés destinés au même joueur: l'entrée la plus récente de chaque joueur est conservée.
+        Le résultat équivaut à appliquer les deux instantanés l'un après l'autre (un instantané complet inclus).
+    """
+    entry_bytes = NetMessage.DATA_SNAPSHOT_ENTRY_BYTES
+    entries = {}
+    for data in (pending.data, message.data):
+        for offset in range(0, len(data) - entry_bytes + 1, entry_bytes):
+            entries[data[offset:offset + NetMessage.SRC_BYTES]] = data[offset:offset + entry_bytes]
+    return NetMessage(message.command, message.source, message.destination, "".join(entries.values()))
+
+
+class NetTXLanes:
+    """
+        File de transmission à voies prioritaires d'une session (même interface que Queue).
+        Les messages de contrôle ne sont jamais rejetés et passent en premier. Une position en attente
+        est remplacée sur place par la plus récente du même joueur; un instantané en attente est fusionné
+        avec le suivant, si bien qu'un client lent n'en accumule jamais plus d'un.
+    """
+
+    LATEST_VALUE_COMMANDS = {NetMessage.CMD['position'], NetMessage.CMD['snapshot']}
+
+    def __init__(self) -> None:
+        self.__not_empty = threading.Condition()
+        self.__control = deque()
+        self.__latest = {}      # {(commande, source): message}, dans l'ordre d'arrivée
+
+        self.superseded = 0     # positions et instantanés remplacés (ou fusionnés) avant d'avoir été transmis
+
+    def __pop(self) -> NetMessage:
+        if self.__control:
+            return self.__control.popleft()
+        if self.__latest:
+            return self.__latest.pop(next(iter(self.__latest)))
+        raise Empty
+
+    def empty(self) -> bool:
+        return not self.__control and not self.__latest
+
+    def get(self, block: bool = True, timeout: float = None) -> NetMessage:
+        with self.__not_empty:
+            if block and self.empty():
+                self.__not_empty.wait(timeout)
+            return self.__pop()
+
+    def get_nowait(self) -> NetMessage:
+        return self.get(False)
+
+    def put(self, message: NetMessage) -> None:
+        with self.__not_empty:
+            if message.command in self.LATEST_VALUE_COMMANDS:
+                key = (message.command, message.source)
+                pending = self.__latest.get(key)
+                if pending:
+                    self.superseded += 1
+                    DROPPED_MESSAGES.inc()
+                    if message.is_snapshot():
+                        message = _merge_snapshots(pending, message)
+                self.__latest[key] = message
+            else:
+                self.__control.append(message)
+            self.__not_empty.notify()
+
+    def qsize(self) -> int:
+        return len(self.__control) + len(self.__latest)
+
+
 class NetSessionController:
     """Gère les tâches RX et TX d'une session TCP/IP."""
 
-    def __init__(self, client_socket: socket.socket) -> None:
-        self.tx_queue = Queue(maxsize=MAX_TX_QSIZE)
+    def __init__(self, client_socket: socket.socket, codec: str = NetCodec.TEXT) -> None:
+        self.tx_queue = NetTXLanes()
         self.rx_queue = Queue(maxsize=MAX_RX_QSIZE)
 
+        # Format utilisé en transmission. Le serveur adopte le format binaire dès qu'un client l'utilise.
+        self.codec = codec
+
         self.tx = NetTX(client_socket, self)
         self.rx = NetRX(client_socket, self)
 
@@ -181,15 +472,46 @@ class NetSessionController:
         self.rx.stop()
         self.rx.join()
 
+    def deliver(self, message: NetMessage) -> None:
+        """Place un message local sur la queue RX, comme s'il venait du réseau."""
+        self.rx_queue.put(message)
+
     def write(self, message: NetMessage) -> None:
-        if not self.tx_queue.full():
-            self.tx_queue.put(message)
+        self.tx_queue.put(message)
+
+    @property
+    def dropped(self) -> int:
+        return self.tx_queue.superseded
+
+    @property
+    def tx_depth(self) -> int:
+        return self.tx_queue.qsize()
+
+    @property
+    def rx_depth(self) -> int:
+        return self.rx_queue.qsize()
+
+
+def open_session(ctrl, session_id: int, announce: bool) -> None:
+    """
+        Transmet son identifiant au client d'une nouvelle session. Si announce est faux, la couche application
+        attribue elle-même les identifiants: elle reçoit plutôt un message SID local (session_id dans les données).
+    """
+    if announce:
+        ctrl.write(NetMessage(NetMessage.CMD['sessionID'], NetMessage.SRC_SERVER,
+                              str(session_id).zfill(NetMessage.SRC_BYTES), str(session_id)))
+    else:
+        message = NetMessage(NetMessage.CMD['sessionID'], NetMessage.SRC_UNDEFINED, NetMessage.DEST_UNDEFINED,
+                             str(session_id))
+        message.local = True
+        ctrl.deliver(message)
 
 
 class NetClient:
     """Client d'une session TCP/IP. Couche présentation de la communication réseau."""
 
-    def __init__(self, host: str = NetSettings.SERVER_HOST, port: int = NetSettings.SERVER_PORT) -> None:
+    def __init__(self, host: str = NetSettings.SERVER_HOST, port: int = NetSettings.SERVER_PORT,
+                 codec: str = NetSettings.CODEC) -> None:
 
         print(f"Connecting to {host} on port {port}...")
 
@@ -202,7 +524,17 @@ class NetClient:
 
         print("Connected!")
 
-        self.session_ctrl = NetSessionController(client_socket)
+        self.host = host
+        self.session_ctrl = NetSessionController(client_socket, codec)
+        self.udp_channel = None
+
+    def enable_udp(self, port: int, token: str) -> None:
+        """Ouvre le canal UDP offert par le serveur; les positions y passeront dès qu'il sera confirmé."""
+        if self.udp_channel:
+            return
+        self.udp_channel = NetUDPChannel.connect(self.host, port)
+        self.udp_channel.start()
+        self.udp_channel.hello(token)
 
     def receive(self) -> list:
         messages = []
@@ -214,16 +546,25 @@ class NetClient:
             else:
                 break
 
+        if self.udp_channel:
+            messages.extend(self.udp_channel.receive())
+
         return messages
 
     def send(self, message: NetMessage) -> None:
-        self.session_ctrl.write(message)
+        if self.udp_channel and self.udp_channel.ready and message.command in NetUDPChannel.COMMANDS:
+            self.udp_channel.send(message)
+        else:
+            self.session_ctrl.write(message)
 
     def start(self) -> None:
         self.session_ctrl.start()
 
     def stop(self) -> None:
         self.session_ctrl.stop()
+        if self.udp_channel:
+            self.udp_channel.stop()
+            self.udp_channel.join()
         print("Client diconnected from server")
 
 
@@ -231,28 +572,22 @@ class NetListener(threading.Thread):
     """Écoute pour de nouvelles connexions au serveur. Crée les sessions."""
 
     def __init__(self, server_socket: socket.socket,
-                 host: str = NetSettings.SERVER_HOST, port: int = NetSettings.SERVER_PORT) -> None:
+                 host: str = NetSettings.SERVER_HOST, port: int = NetSettings.SERVER_PORT,
+                 max_sessions: int = NetSettings.MAX_SESSIONS, announce_sessions: bool = True) -> None:
         super().__init__()
 
         self.server_socket = server_socket
         self.host = host
         self.port = port
+        self.announce_sessions = announce_sessions
 
         # Dictionnaire sous le format {session_id: isUsed}
-        self.sessions_ids = {0: False, 1: False, 2: False,
-                             3: False, 4: False, 5: False, 6: False}
+        self.sessions_ids = {session_id: False for session_id in range(max_sessions)}
 
         self.session_controllers = []
 
         self.running = False
 
-    @staticmethod
-    def __send_session_id(ctrl: NetSessionController, session_id: int) -> None:
-        ctrl.write(NetMessage(NetMessage.CMD['sessionID'],
-                              NetMessage.SRC_SERVER,
-                              str(session_id).zfill(NetMessage.SRC_BYTES),
-                              str(session_id)))
-    
     @staticmethod
     def __send_close(ctrl: NetSessionController) -> None:
         ctrl.write(NetMessage(NetMessage.CMD['close'], NetMessage.SRC_SERVER, NetMessage.DEST_UNDEFINED, "No spot is left for another player"))
@@ -290,7 +625,7 @@ class NetListener(threading.Thread):
 
                     # On cherche le premier session_id qui dont l'usage est False
                     if session_id != -1:
-                        self.__send_session_id(session_controller, session_id)
+                        open_session(session_controller, session_id, self.announce_sessions)
                         self.sessions_ids[session_id] = True
                         print(f"Client {session_id} connected from {ip_address[0]}:{ip_address[1]}")
                     else:
@@ -314,7 +649,8 @@ class NetListener(threading.Thread):
 class NetServer:
     """Serveur de sessions TCP/IP. Couche présentation de la communication réseau."""
 
-    def __init__(self, host: str = NetSettings.SERVER_HOST, port: int = NetSettings.SERVER_PORT) -> None:
+    def __init__(self, host: str = NetSettings.SERVER_HOST, port: int = NetSettings.SERVER_PORT,
+                 max_sessions: int = NetSettings.MAX_SESSIONS, announce_sessions: bool = True) -> None:
         print("Starting server...")
 
         self.__server_socket = socket.socket(
@@ -328,7 +664,7 @@ class NetServer:
             print("ERROR : Failed to bind socket.")
             sys.exit()
 
-        self.listener = NetListener(self.__server_socket)
+        self.listener = NetListener(self.__server_socket, host, port, max_sessions, announce_sessions)
 
     @staticmethod
     def get_ip() -> str:
@@ -344,20 +680,21 @@ class NetServer:
 
     def receive(self) -> list:
         all_messages = []
-        for ctrl in self.listener.session_controllers:
-            messages = self.receive_from_ctrl(ctrl)
+        for session_id, ctrl in enumerate(self.listener.session_controllers):
+            messages = self.receive_from_ctrl(ctrl, session_id)
             for message in messages:
                 all_messages.append(message)
         return all_messages
 
     @staticmethod
-    def receive_from_ctrl(ctrl: NetSessionController) -> list:
+    def receive_from_ctrl(ctrl: NetSessionController, session_id: int = None) -> list:
         messages = []
 
         if ctrl:
             while True:
                 message = ctrl.read()
                 if message:
+                    message.session = session_id
                     messages.append(message)
                 else:
                     break
@@ -380,6 +717,10 @@ class NetServer:
             if ctrl != ctrl_to_avoid:
                 ctrl.write(message.copy())
 
+    def send_to_session(self, session_id: int, message: NetMessage) -> None:
+        """Envoie un message tel quel à une session, sans tenir compte de sa destination."""
+        self.listener.ctrl(session_id).write(message)
+
     def sessions_controllers(self) -> list:
         return self.listener.session_controllers
 
@@ -395,6 +736,542 @@ class NetServer:
         self.listener.stop()
 
 
+class NetSelectorSession:
+    """Session TCP/IP servie par la boucle d'un NetSelectorServer (aucune tâche dédiée)."""
+
+    def __init__(self, session_socket: socket.socket, server) -> None:
+        self.session_socket = session_socket
+        self.session_socket.setblocking(False)
+        self.__server = server
+
+        self.tx_queue = NetTXLanes()
+        self.rx_queue = deque()     # sans limite: aucun message reçu (ex.: CLO) ne doit être perdu
+
+        self.rx_buffer = NetRXBuffer()
+        self.tx_buffer = bytearray()
+
+        self.codec = NetCodec.TEXT
+        self.closing = False
+        self.want_write = False
+
+    def read(self) -> NetMessage or None:
+        if self.rx_queue:
+            return self.rx_queue.popleft()
+
+        return None
+
+    def deliver(self, message: NetMessage) -> None:
+        """Place un message local sur la queue RX, comme s'il venait du réseau."""
+        self.rx_queue.append(message)
+
+    def stop(self) -> None:
+        self.closing = True
+        self.__server.wake(self)
+
+    def write(self, message: NetMessage) -> None:
+        self.tx_queue.put(message)
+        self.__server.wake(self)
+
+    @property
+    def dropped(self) -> int:
+        return self.tx_queue.superseded
+
+    @property
+    def tx_depth(self) -> int:
+        return self.tx_queue.qsize()
+
+    @property
+    def rx_depth(self) -> int:
+        return len(self.rx_queue)
+
+
+class NetSelectorServer:
+    """
+        Serveur de sessions TCP/IP en une seule boucle (selectors/epoll).
+        Une seule tâche possède le socket d'écoute et tous les sockets de session. Même interface que NetServer.
+        Sans socket d'écoute (listen=False), le serveur ne sert que les connexions qui lui sont confiées par adopt().
+    """
+
+    def __init__(self, host: str = NetSettings.SERVER_HOST, port: int = NetSettings.SERVER_PORT,
+                 max_sessions: int = NetSettings.MAX_SESSIONS, announce_sessions: bool = True,
+                 listen: bool = True) -> None:
+        print("Starting server...")
+
+        self.__server_socket = None
+        if listen:
+            self.__server_socket = socket.socket(
+                socket.AF_INET, socket.SOCK_STREAM)
+            self.__server_socket.setblocking(False)
+
+            try:
+                self.__server_socket.bind((host, port))
+            except socket.error:
+                print("ERROR : Failed to bind socket.")
+                sys.exit()
+
+        self.__adopted_sockets = deque()
+        self.adopted = 0    # connexions confiées par adopt() déjà traitées (session ouverte, refusée ou perdue)
+        self.__pending_sessions = deque()
+        self.__woken = False
+        self.__selector = selectors.DefaultSelector()
+        self.__wake_rx, self.__wake_tx = socket.socketpair()
+        self.__wake_rx.setblocking(False)
+        self.__wake_tx.setblocking(False)
+
+        # Dictionnaire sous le format {session_id: isUsed}
+        self.sessions_ids = {session_id: False for session_id in range(max_sessions)}
+        self.session_controllers = []
+        self.announce_sessions = announce_sessions
+
+        self.__thread = threading.Thread(target=self.__run)
+        self.running = False
+
+    def __accept(self) -> None:
+        try:
+            client_socket, ip_address = self.__server_socket.accept()
+        except BlockingIOError:
+            return
+
+        self.__open(client_socket, ip_address)
+
+    def __open(self, client_socket: socket.socket, ip_address: tuple) -> None:
+        session_id = next((key for key, used in self.sessions_ids.items() if not used), -1)
+        session = NetSelectorSession(client_socket, self)
+        self.__selector.register(client_socket, selectors.EVENT_READ, session)
+
+        if session_id == -1:
+            session.write(NetMessage(NetMessage.CMD['close'], NetMessage.SRC_SERVER, NetMessage.DEST_UNDEFINED,
+                                     "No spot is left for another player"))
+            session.stop()
+            print("No spot is left for another player")
+            return
+
+        if len(self.session_controllers) > session_id:
+            self.session_controllers[session_id] = session
+        else:
+            self.session_controllers.append(session)
+
+        self.sessions_ids[session_id] = True
+        open_session(session, session_id, self.announce_sessions)
+        print(f"Client {session_id} connected from {ip_address[0]}:{ip_address[1]}")
+
+    def __adopt(self, client_socket: socket.socket) -> None:
+        # Le client a pu fermer la connexion entre son acceptation par un autre processus et son adoption ici
+        try:
+            self.__open(client_socket, client_socket.getpeername())
+        except OSError as error:
+            print(f"Adopted connection lost before opening its session: {error}")
+            client_socket.close()
+        self.adopted += 1
+
+    def __close(self, session: NetSelectorSession) -> None:
+        try:
+            self.__selector.unregister(session.session_socket)
+        except (KeyError, ValueError):
+            pass
+        session.session_socket.close()
+
+    def __flush(self, session: NetSelectorSession) -> None:
+        """Encode les messages en attente et en envoie le plus possible sans bloquer."""
+        if session.session_socket.fileno() == -1:
+            return
+
+        while not session.tx_queue.empty():
+            session.tx_buffer += encode_outgoing(session.tx_queue.get_nowait(), session.codec)
+
+        if session.tx_buffer:
+            try:
+                sent = session.session_socket.send(session.tx_buffer)
+                del session.tx_buffer[:sent]
+            except BlockingIOError:
+                pass
+            except OSError:
+                session.tx_buffer.clear()
+                session.closing = True
+
+        if session.closing and not session.tx_buffer:
+            self.__close(session)
+            return
+
+        want_write = bool(session.tx_buffer)
+        if want_write != session.want_write:
+            session.want_write = want_write
+            events = selectors.EVENT_READ | selectors.EVENT_WRITE if want_write else selectors.EVENT_READ
+            self.__selector.modify(session.session_socket, events, session)
+
+    def __read(self, session: NetSelectorSession) -> None:
+        try:
+            received = session.rx_buffer.recv_from(session.session_socket)
+        except BlockingIOError:
+            return
+        except OSError:
+            received = 0
+
+        if not received:
+            self.__close(session)
+            return
+
+        session.rx_queue.extend(session.rx_buffer.messages())
+        if session.rx_buffer.binary_seen:
+            session.codec = NetCodec.BINARY
+
+    def __run(self) -> None:
+        if self.__server_socket:
+            self.__selector.register(self.__server_socket, selectors.EVENT_READ)
+        self.__selector.register(self.__wake_rx, selectors.EVENT_READ)
+
+        while self.running:
+            for key, events in self.__selector.select(timeout=1.0):
+                if key.fileobj is self.__server_socket:
+                    self.__accept()
+                elif key.fileobj is self.__wake_rx:
+                    self.__drain_wake()
+                    while self.__adopted_sockets:
+                        self.__adopt(self.__adopted_sockets.popleft())
+                else:
+                    if events & selectors.EVENT_READ:
+                        self.__read(key.data)
+                    if events & selectors.EVENT_WRITE:
+                        self.__flush(key.data)
+
+            # Les écritures et fermetures demandées par les autres tâches sont traitées à chaque réveil.
+            while self.__pending_sessions:
+                self.__flush(self.__pending_sessions.popleft())
+
+        for key in list(self.__selector.get_map().values()):
+            if isinstance(key.data, NetSelectorSession):
+                self.__close(key.data)
+        self.__selector.close()
+        if self.__server_socket:
+            self.__server_socket.close()
+
+    def __drain_wake(self) -> None:
+        # Le drapeau n'est levé qu'après la vidange: un réveil demandé pendant celle-ci a déjà placé sa session
+        # en attente, et les sessions en attente sont traitées après les événements de ce passage de la boucle.
+        try:
+            while self.__wake_rx.recv(RECV_SIZE):
+                pass
+        except BlockingIOError:
+            pass
+        self.__woken = False
+
+    def adopt(self, client_socket: socket.socket) -> None:
+        """Confie au serveur une connexion acceptée ailleurs (ex.: par un autre processus)."""
+        self.__adopted_sockets.append(client_socket)
+        self.wake()
+
+    def wake(self, session: NetSelectorSession = None) -> None:
+        """Réveille la boucle pour qu'elle traite les écritures en attente (de la session, s'il y a lieu)."""
+        if session:
+            self.__pending_sessions.append(session)
+        if self.__woken:
+            return
+        self.__woken = True
+        try:
+            self.__wake_tx.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    @staticmethod
+    def get_ip() -> str:
+        """Retourne l'adresse IP du serveur."""
+        return NetServer.get_ip()
+
+    def get_port(self) -> int or None:
+        """Retourne le port sur lequel écoute le serveur."""
+        return self.__server_socket.getsockname()[1] if self.__server_socket else None
+
+    def ctrl(self, session_id: int) -> NetSelectorSession:
+        return self.session_controllers[session_id]
+
+    def receive(self) -> list:
+        all_messages = []
+        for session_id, session in enumerate(self.session_controllers):
+            all_messages.extend(NetServer.receive_from_ctrl(session, session_id))
+        return all_messages
+
+    def send(self, message: NetMessage) -> None:
+        """Envoie un message à/aux clients dans la destination."""
+        if message.destination != NetMessage.DEST_ALL:
+            self.ctrl(int(message.destination)).write(message.copy())
+        else:
+            for session in self.session_controllers:
+                session.write(message.copy())
+
+    def send_to_all_but_one(self, message: NetMessage, session_id: str) -> None:
+        """Envoie un message à tous les clients connectés sauf un (session_id)."""
+        session_to_avoid = self.ctrl(int(session_id))
+        for session in self.session_controllers:
+            if session != session_to_avoid:
+                session.write(message.copy())
+
+    def send_to_session(self, session_id: int, message: NetMessage) -> None:
+        """Envoie un message tel quel à une session, sans tenir compte de sa destination."""
+        self.ctrl(session_id).write(message)
+
+    def sessions_controllers(self) -> list:
+        return self.session_controllers
+
+    def close_session_controller(self, session_id: str) -> None:
+        self.ctrl(int(session_id)).stop()
+        self.sessions_ids[int(session_id)] = False
+
+    def start(self) -> None:
+        if self.__server_socket:
+            self.__server_socket.listen(LISTEN_QUEUE)
+        self.running = True
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.running = False
+        self.wake()
+        self.__thread.join()
+        self.__wake_rx.close()
+        self.__wake_tx.close()
+        print("Server closed")
+
+
+class NetUDPChannel(threading.Thread):
+    """
+        Canal UDP non fiable, en parallèle de la session TCP, pour les positions et les instantanés (ceux-ci sont
+        complets à intervalle régulier, voir GameRoom.send_snapshots, pour qu'une perte ne dure pas).
+        Chaque paquet porte un numéro de séquence propre à l'émetteur; un paquet plus ancien que le dernier reçu
+        du même joueur est rejeté. Le client s'annonce avec le jeton reçu par TCP (CMD_UDP) et n'utilise le canal
+        qu'une fois l'annonce confirmée par le serveur. Les messages de contrôle restent sur TCP.
+    """
+
+    COMMANDS = {NetMessage.CMD['position'], NetMessage.CMD['snapshot']}
+
+    PACKET_HEADER = struct.Struct('>BI')    # type de paquet|numéro de séquence
+    HELLO = 1
+    HELLO_ACK = 2
+    DATA = 3
+
+    HELLO_INTERVAL = 0.2
+    HELLO_ATTEMPTS = 10
+
+    def __init__(self, udp_socket: socket.socket, server_address: tuple = None) -> None:
+        super().__init__()
+
+        self.udp_socket = udp_socket
+        self.udp_socket.setblocking(False)
+        self.__server_address = server_address  # None du côté serveur
+
+        self.rx_queue = deque()
+        self.on_receive = None  # appelée par la tâche du canal après chaque message reçu (ex.: réveil d'une boucle)
+        self.__next_seq = {}    # {adresse: prochain numéro de séquence à émettre}
+        self.__last_seq = {}    # {(adresse, joueur): dernier numéro de séquence accepté}
+        self.discarded = 0      # paquets périmés ou en désordre rejetés
+
+        # Côté serveur
+        self.__tokens = {}      # {jeton: session_id}
+        self.__peers = {}       # {session_id: adresse}
+        self.__sessions = {}    # {adresse: session_id}
+
+        # Côté client
+        self.__token = None
+        self.__hello_attempts = 0
+        self.ready = False
+
+        self.running = False
+
+    @classmethod
+    def bind(cls, host: str, port: int):
+        """Crée le canal du serveur, sur le même port que le serveur TCP."""
+        udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp_socket.bind((host, port))
+        return cls(udp_socket)
+
+    @classmethod
+    def connect(cls, host: str, port: int):
+        """Crée le canal d'un client vers le serveur."""
+        udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp_socket.connect((host, port))
+        return cls(udp_socket, udp_socket.getpeername())
+
+    def __send_packet(self, kind: int, address: tuple, payload: bytes = b'') -> None:
+        seq = self.__next_seq.get(address, 0)
+        self.__next_seq[address] = seq + 1
+        try:
+            self.udp_socket.sendto(self.PACKET_HEADER.pack(kind, seq) + payload, address)
+        except OSError:
+            pass
+
+    def __handle_packet(self, packet: bytes, address: tuple) -> None:
+        if len(packet) < self.PACKET_HEADER.size:
+            return
+        kind, seq = self.PACKET_HEADER.unpack_from(packet)
+        payload = packet[self.PACKET_HEADER.size:]
+
+        if kind == self.HELLO and self.__server_address is None:
+            session_id = self.__tokens.get(payload.decode(errors='replace'))
+            if session_id is not None:
+                self.__peers[session_id] = address
+                self.__sessions[address] = session_id
+                self.__send_packet(self.HELLO_ACK, address)
+        elif kind == self.HELLO_ACK and self.__server_address:
+            self.ready = True
+        elif kind == self.DATA:
+            if self.__server_address is None and address not in self.__sessions:
+                return
+            message, _ = decode_frame(payload)
+            if not message:
+                return
+            key = (address, message.source)
+            if seq <= self.__last_seq.get(key, -1):
+                self.discarded += 1
+                return
+            self.__last_seq[key] = seq
+            message.session = self.__sessions.get(address)
+            self.rx_queue.append(message)
+            MESSAGES_RECEIVED.inc(1, message.command)
+            BYTES_RECEIVED.inc(len(payload))
+            if self.on_receive:
+                self.on_receive()
+
+    def __send_data(self, address: tuple, message: NetMessage) -> None:
+        payload = message2binary(message)
+        self.__send_packet(self.DATA, address, payload)
+        MESSAGES_SENT.inc(1, message.command)
+        BYTES_SENT.inc(len(payload))
+
+    def forget(self, session_id: int) -> None:
+        """Oublie le client d'une session fermée (côté serveur)."""
+        address = self.__peers.pop(session_id, None)
+        self.__sessions.pop(address, None)
+        for token in [token for token, token_session in self.__tokens.items() if token_session == session_id]:
+            del self.__tokens[token]
+
+    def has_peer(self, session_id: int) -> bool:
+        return session_id in self.__peers
+
+    def hello(self, token: str) -> None:
+        """Annonce le client au serveur (répété jusqu'à confirmation)."""
+        self.__token = token
+        self.__hello_attempts = 1
+        self.__send_packet(self.HELLO, self.__server_address, token.encode())
+
+    def receive(self) -> list:
+        messages = []
+        while self.rx_queue:
+            messages.append(self.rx_queue.popleft())
+        return messages
+
+    def register(self, session_id: int) -> str:
+        """Crée le jeton qu'une session devra présenter pour utiliser le canal (côté serveur)."""
+        token = os.urandom(8).hex()
+        self.__tokens[token] = session_id
+        return token
+
+    def send(self, message: NetMessage) -> None:
+        """Envoie un message au serveur (côté client)."""
+        self.__send_data(self.__server_address, message)
+
+    def send_to_session(self, session_id: int, message: NetMessage) -> None:
+        """Envoie un message au client d'une session (côté serveur)."""
+        address = self.__peers.get(session_id)
+        if address:
+            self.__send_data(address, message)
+
+    def run(self) -> None:
+        self.running = True
+
+        while self.running:
+            try:
+                readable, _, _ = select.select([self.udp_socket], [], [], self.HELLO_INTERVAL)
+                if readable:
+                    packet, address = self.udp_socket.recvfrom(RECV_SIZE)
+                    self.__handle_packet(packet, address)
+                elif self.__token and not self.ready and self.__hello_attempts < self.HELLO_ATTEMPTS:
+                    self.__hello_attempts += 1
+                    self.__send_packet(self.HELLO, self.__server_address, self.__token.encode())
+            except (BlockingIOError, ConnectionRefusedError):
+                continue
+            except OSError:
+                break
+
+        self.udp_socket.close()
+
+    def stop(self) -> None:
+        self.running = False
+
+
+class NetRXBuffer:
+    """
+        Tampon de réception persistant d'une session.
+        Conserve les trames partielles entre deux lectures et les décode sur place (sans recopier le reste du tampon).
+    """
+
+    def __init__(self, size: int = RX_BUFFER_SIZE) -> None:
+        self.__buffer = bytearray(size)
+        self.__start = 0    # début des octets non traités
+        self.__end = 0      # fin des octets reçus
+
+        self.binary_seen = False
+        self.errors = 0
+
+    def __len__(self) -> int:
+        return self.__end - self.__start
+
+    def __reserve(self, size: int) -> None:
+        """S'assure qu'il y a au moins size octets libres à la fin du tampon."""
+        if self.__end + size <= len(self.__buffer):
+            return
+
+        # On ramène d'abord les octets non traités au début du tampon, puis on l'agrandit au besoin.
+        pending = self.__end - self.__start
+        if self.__start:
+            self.__buffer[:pending] = self.__buffer[self.__start:self.__end]
+            self.__start = 0
+            self.__end = pending
+
+        if pending + size > len(self.__buffer):
+            self.__buffer.extend(bytes(max(pending + size - len(self.__buffer), len(self.__buffer))))
+
+    def feed(self, data: bytes) -> None:
+        """Ajoute des octets reçus à la fin du tampon."""
+        self.__reserve(len(data))
+        self.__buffer[self.__end:self.__end + len(data)] = data
+        self.__end += len(data)
+
+    def recv_from(self, session_socket: socket.socket, size: int = RECV_SIZE) -> int:
+        """Lit directement du socket dans le tampon. Retourne le nombre d'octets lus (0 si la connexion est fermée)."""
+        self.__reserve(size)
+        with memoryview(self.__buffer) as view:
+            received = session_socket.recv_into(view[self.__end:self.__end + size])
+        self.__end += received
+        return received
+
+    def messages(self) -> list:
+        """Extrait tous les messages complets. Les octets d'une trame partielle restent dans le tampon."""
+        messages = []
+
+        with memoryview(self.__buffer) as view, view[:self.__end] as data:
+            offset = self.__start
+            while offset < self.__end:
+                is_binary = data[offset] & BINARY_FLAG
+                message, length = decode_frame(data, offset)
+                if not length:
+                    break
+                if message:
+                    self.binary_seen = self.binary_seen or bool(is_binary)
+                    messages.append(message)
+                    MESSAGES_RECEIVED.inc(1, message.command)
+                else:
+                    self.errors += 1
+                    PARSE_ERRORS.inc()
+                    print("ERROR: bad data type, message dropped")
+                offset += length
+
+        BYTES_RECEIVED.inc(offset - self.__start)
+        if offset >= self.__end:
+            self.__start = self.__end = 0
+        else:
+            self.__start = offset
+
+        return messages
+
+
 class NetRX(threading.Thread):
     """Tâche de réception des messages en provenance du réseau."""
 
@@ -405,6 +1282,8 @@ class NetRX(threading.Thread):
         self.session_socket.setblocking(False)
         self.session_controller = session_controller
 
+        self.rx_buffer = NetRXBuffer()
+
         self.running = False
 
     def __queue(self, messages: list) -> None:
@@ -412,25 +1291,6 @@ class NetRX(threading.Thread):
         for message in messages:
             self.session_controller.rx_queue.put(message)
 
-    @staticmethod
-    def __split(data: str) -> list:
-        """Découpe une chaîne de caractères reçue du réseau en messages."""
-        messages = []
-
-        while len(data) > 0:
-            message = data2message(data)
-            if not message:
-                print("ERROR: data doesn't respect length, buffer dropped")
-                break
-            if type(message) == NetMessage:
-                data = data[NetMessage.HEADER_BYTES+len(message.data):]
-                messages.append(message)
-            else:
-                data = data[message:]
-                print("ERROR: bad data type, message dropped")
-
-        return messages
-
     def run(self) -> None:
         self.running = True
 
@@ -438,13 +1298,13 @@ class NetRX(threading.Thread):
             try:
                 readable, _, _ = select.select(
                     [self.session_socket], [], [], 0.1)
-                for s in readable:
-                    if s == self.session_socket:
-                        raw_data = self.session_socket.recv(4096)
-                    if raw_data:
-                        data = raw_data.decode()
-                        messages = self.__split(data)
-                        self.__queue(messages)
+                if readable and self.rx_buffer.recv_from(self.session_socket):
+                    messages = self.rx_buffer.messages()
+                    if self.rx_buffer.binary_seen:
+                        self.session_controller.codec = NetCodec.BINARY
+                    self.__queue(messages)
+            except BlockingIOError:
+                continue
             except OSError:
                 print("ERROR: Connection with server interrupted.")
                 break
@@ -466,19 +1326,39 @@ class NetTX(threading.Thread):
 
         self.running = False
 
+    def __drain(self, tx_buffer: bytearray) -> None:
+        """Encode à la suite dans tx_buffer tous les messages présents sur la queue TX."""
+        tx_queue = self.session_controller.tx_queue
+        codec = self.session_controller.codec
+        while True:
+            try:
+                message = tx_queue.get_nowait()
+            except Empty:
+                return
+            tx_buffer += encode_outgoing(message, codec)
+
     def run(self) -> None:
         self.running = True
+        tx_buffer = bytearray()
 
         while self.running:
-            if self.session_controller.tx_queue.not_empty:
-                try:
+            try:
+                if not tx_buffer:
                     message = self.session_controller.tx_queue.get(timeout=0.1)
-                    data = message2data(message)
-                    self.session_socket.send(data.encode())
-                except Empty:
-                    continue
-                except OSError:
-                    break
+                    tx_buffer += encode_outgoing(message, self.session_controller.codec)
+
+                # Tout ce qui s'est accumulé depuis le dernier envoi part en un seul appel système.
+                self.__drain(tx_buffer)
+                sent = self.session_socket.send(tx_buffer)
+                del tx_buffer[:sent]
+                if tx_buffer:
+                    select.select([], [self.session_socket], [], 0.1)
+            except Empty:
+                continue
+            except BlockingIOError:
+                select.select([], [self.session_socket], [], 0.1)
+            except OSError:
+                break
 
     def stop(self) -> None:
         self.running = False
@@ -0,0 +1,258 @@
+import asyncio
+import sys
+
+from collections import deque
+
+from network import NetCodec
+from network import NetMessage
+from network import NetRXBuffer
+from network import NetServer
+from network import NetSettings
+from network import encode_outgoing
+from network import open_session
+
+
+class AsyncNetSession(asyncio.Protocol):
+    """Session TCP/IP servie par la boucle asyncio. Même interface read/write/stop que NetSessionController."""
+
+    def __init__(self, messages_available: asyncio.Event, codec: str = NetCodec.TEXT, server=None) -> None:
+        self.transport = None
+        self.codec = codec
+
+        self.rx_buffer = NetRXBuffer()
+        self.rx_queue = deque()
+        self.tx_buffer = bytearray()
+
+        # Octets réellement reçus et remis au transport
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+        self.__messages_available = messages_available
+        self.__server = server
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+        if self.__server:
+            self.__server.open_session(self)
+
+    def connection_lost(self, exc: Exception or None) -> None:
+        self.transport = None
+
+    def data_received(self, data: bytes) -> None:
+        self.bytes_received += len(data)
+        self.rx_buffer.feed(data)
+        self.rx_queue.extend(self.rx_buffer.messages())
+        if self.rx_buffer.binary_seen:
+            self.codec = NetCodec.BINARY
+        if self.rx_queue:
+            self.__messages_available.set()
+
+    def deliver(self, message: NetMessage) -> None:
+        """Place un message local sur la queue RX, comme s'il venait du réseau."""
+        self.rx_queue.append(message)
+        self.__messages_available.set()
+
+    def read(self) -> NetMessage or None:
+        if self.rx_queue:
+            return self.rx_queue.popleft()
+
+        return None
+
+    @property
+    def rx_depth(self) -> int:
+        return len(self.rx_queue)
+
+    def __flush(self) -> None:
+        """Transmet en une seule écriture tous les messages accumulés depuis le dernier passage de la boucle."""
+        if self.transport and not self.transport.is_closing():
+            self.transport.write(self.tx_buffer)
+            self.bytes_sent += len(self.tx_buffer)
+        self.tx_buffer = bytearray()
+
+    def stop(self) -> None:
+        if self.transport:
+            if self.tx_buffer:
+                self.__flush()
+            self.transport.close()
+
+    def write(self, message: NetMessage) -> None:
+        if self.transport and not self.transport.is_closing():
+            if not self.tx_buffer:
+                asyncio.get_running_loop().call_soon(self.__flush)
+            self.tx_buffer += encode_outgoing(message, self.codec)
+
+
+class AsyncNetClient:
+    """Client asyncio d'une session TCP/IP. Même interface que NetClient une fois connecté."""
+
+    def __init__(self, host: str = NetSettings.SERVER_HOST, port: int = NetSettings.SERVER_PORT,
+                 codec: str = NetSettings.CODEC) -> None:
+        self.host = host
+        self.port = port
+        self.codec = codec
+
+        self.session_ctrl = None
+        self.__messages_available = None
+
+    async def connect(self) -> None:
+        """Établit la connexion avec le serveur (à attendre avant d'utiliser le client)."""
+        print(f"Connecting to {self.host} on port {self.port}...")
+
+        loop = asyncio.get_running_loop()
+        self.__messages_available = asyncio.Event()
+        try:
+            _, self.session_ctrl = await loop.create_connection(
+                lambda: AsyncNetSession(self.__messages_available, self.codec), self.host, self.port)
+        except OSError:
+            print("ERROR: Failed to connect to server!")
+            sys.exit()
+
+        print("Connected!")
+
+    async def wait_for_messages(self) -> None:
+        """Attend qu'au moins un message soit disponible."""
+        await self.__messages_available.wait()
+        self.__messages_available.clear()
+
+    def enable_udp(self, port: int, token: str) -> None:
+        """Le canal UDP n'est pas offert par ce client: les positions restent sur TCP."""
+
+    def receive(self) -> list:
+        messages = []
+
+        while True:
+            message = self.session_ctrl.read()
+            if message:
+                messages.append(message)
+            else:
+                break
+
+        return messages
+
+    def send(self, message: NetMessage) -> None:
+        self.session_ctrl.write(message)
+
+    def start(self) -> None:
+        """La connexion est établie par connect(); rien d'autre à démarrer."""
+
+    def stop(self) -> None:
+        self.session_ctrl.stop()
+        print("Client diconnected from server")
+
+
+class AsyncNetServer:
+    """Serveur de sessions TCP/IP basé sur asyncio. Même interface que NetServer."""
+
+    def __init__(self, host: str = NetSettings.SERVER_HOST, port: int = NetSettings.SERVER_PORT,
+                 max_sessions: int = NetSettings.MAX_SESSIONS, announce_sessions: bool = True) -> None:
+        self.host = host
+        self.port = port
+        self.announce_sessions = announce_sessions
+
+        # Dictionnaire sous le format {session_id: isUsed}
+        self.sessions_ids = {session_id: False for session_id in range(max_sessions)}
+        self.session_controllers = []
+
+        self.__server = None
+        self.__loop = None
+        self.__messages_available = None
+
+    async def start_serving(self) -> None:
+        """Ouvre le socket d'écoute dans la boucle asyncio courante."""
+        print("Starting server...")
+
+        loop = self.__loop = asyncio.get_running_loop()
+        self.__messages_available = asyncio.Event()
+        try:
+            self.__server = await loop.create_server(
+                lambda: AsyncNetSession(self.__messages_available, server=self), self.host, self.port)
+        except OSError:
+            print("ERROR : Failed to bind socket.")
+            sys.exit()
+
+    async def wait_for_messages(self) -> None:
+        """Attend qu'au moins un message soit disponible."""
+        await self.__messages_available.wait()
+        self.__messages_available.clear()
+
+    def notify_messages(self) -> None:
+        """Signale, depuis une autre tâche (ex.: le canal UDP), que des messages attendent hors des sessions TCP."""
+        try:
+            self.__loop.call_soon_threadsafe(self.__messages_available.set)
+        except RuntimeError:
+            pass    # boucle déjà fermée
+
+    def open_session(self, session: AsyncNetSession) -> None:
+        """Attribue un identifiant de session à une nouvelle connexion (ou la refuse s'il n'y a plus de place)."""
+        session_id = next((key for key, used in self.sessions_ids.items() if not used), -1)
+
+        if session_id == -1:
+            session.write(NetMessage(NetMessage.CMD['close'], NetMessage.SRC_SERVER, NetMessage.DEST_UNDEFINED,
+                                     "No spot is left for another player"))
+            session.stop()
+            print("No spot is left for another player")
+            return
+
+        if len(self.session_controllers) > session_id:
+            self.session_controllers[session_id] = session
+        else:
+            self.session_controllers.append(session)
+
+        self.sessions_ids[session_id] = True
+        open_session(session, session_id, self.announce_sessions)
+        ip_address = session.transport.get_extra_info('peername')
+        print(f"Client {session_id} connected from {ip_address[0]}:{ip_address[1]}")
+
+    @staticmethod
+    def get_ip() -> str:
+        """Retourne l'adresse IP du serveur."""
+        return NetServer.get_ip()
+
+    def get_port(self) -> int:
+        """Retourne le port sur lequel écoute le serveur."""
+        return self.__server.sockets[0].getsockname()[1]
+
+    def ctrl(self, session_id: int) -> AsyncNetSession:
+        return self.session_controllers[session_id]
+
+    def receive(self) -> list:
+        all_messages = []
+        for session_id, session in enumerate(self.session_controllers):
+            all_messages.extend(NetServer.receive_from_ctrl(session, session_id))
+        return all_messages
+
+    def send(self, message: NetMessage) -> None:
+        """Envoie un message à/aux clients dans la destination."""
+        if message.destination != NetMessage.DEST_ALL:
+            self.ctrl(int(message.destination)).write(message)
+        else:
+            for session in self.session_controllers:
+                session.write(message)
+
+    def send_to_all_but_one(self, message: NetMessage, session_id: str) -> None:
+        """Envoie un message à tous les clients connectés sauf un (session_id)."""
+        session_to_avoid = self.ctrl(int(session_id))
+        for session in self.session_controllers:
+            if session != session_to_avoid:
+                session.write(message)
+
+    def send_to_session(self, session_id: int, message: NetMessage) -> None:
+        """Envoie un message tel quel à une session, sans tenir compte de sa destination."""
+        self.ctrl(session_id).write(message)
+
+    def sessions_controllers(self) -> list:
+        return self.session_controllers
+
+    def close_session_controller(self, session_id: str) -> None:
+        self.ctrl(int(session_id)).stop()
+        self.sessions_ids[int(session_id)] = False
+
+    def start(self) -> None:
+        """Le socket d'écoute est ouvert par start_serving(); rien d'autre à démarrer."""
+
+    def stop(self) -> None:
+        for session in self.session_controllers:
+            session.stop()
+        if self.__server:
+            self.__server.close()
+        print("Server closed")
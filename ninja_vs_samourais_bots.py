@@ -0,0 +1,226 @@
+import argparse
+import asyncio
+import random
+
+from game import Game
+from game import GameState
+from game_client import GameClient
+from network import NetCodec
+from network import NetSettings
+from network_async import AsyncNetClient
+from pathfinding import MOVES
+from pathfinding import DistanceField
+
+
+# Mêmes cadences que la fenêtre (ninja_vs_samourais_window), pour générer un trafic réaliste
+MOVING_PACE = 5 / 60
+COOLDOWN = 2.0
+
+
+class RandomPolicy:
+    """Change de direction au hasard de temps en temps et attaque dès que possible (si attack)."""
+
+    def __init__(self, turn_probability: float = 0.2, seed: int = None, attack: bool = True) -> None:
+        self.__random = random.Random(seed)
+        self.__turn_probability = turn_probability
+        self.__facing = self.__random.choice('nsew')
+        self.__attack = attack
+
+    def next_move(self, game: Game) -> str or None:
+        if self.__random.random() < self.__turn_probability:
+            self.__facing = self.__random.choice('nsew')
+        return self.__facing
+
+    def wants_to_attack(self, game: Game) -> bool:
+        return self.__attack
+
+
+class ScriptedPolicy:
+    """Rejoue une suite de directions ('n', 's', 'e', 'w', ou '.' pour rester sur place) en boucle."""
+
+    def __init__(self, script: str) -> None:
+        self.__script = script or '.'
+        self.__index = 0
+
+    def next_move(self, game: Game) -> str or None:
+        facing = self.__script[self.__index % len(self.__script)]
+        self.__index += 1
+        return facing if facing in MOVES else None
+
+    @staticmethod
+    def wants_to_attack(game: Game) -> bool:
+        return True
+
+
+class ChasePolicy:
+    """
+        Samouraï: poursuit le ninja en suivant le champ de distances partagé du niveau, jusqu'à la case voisine.
+        Ninja: se déplace au hasard.
+    """
+
+    def __init__(self, seed: int = None) -> None:
+        self.__random_policy = RandomPolicy(seed=seed)
+
+    def next_move(self, game: Game) -> str or None:
+        if game.i_am_the_ninja():
+            return self.__random_policy.next_move(game)
+        field = DistanceField.for_level(game.level)
+        field.update(game.get_ninja().position)
+        position = game.get_current_player().position
+        if field.distance(*position) <= 1:
+            return None     # à côté du ninja: il est en vue, on reste pour l'attaquer
+        return field.next_move(position)
+
+    @staticmethod
+    def wants_to_attack(game: Game) -> bool:
+        return True
+
+
+POLICIES = {'random': RandomPolicy, 'chase': ChasePolicy}
+
+
+class HeadlessPlayer:
+    """
+        Joueur sans affichage: même poignée de main que NinjaVSSamourais.on_update (niveau, liste des joueurs),
+        mêmes déplacements et attaques, mais décidés par une politique (policy) plutôt que par le clavier.
+    """
+
+    def __init__(self, game_client_factory, policy, moving_pace: float = MOVING_PACE) -> None:
+        self.game = Game()
+        self.game_client = game_client_factory(self.close)
+        self.policy = policy
+        self.moving_pace = moving_pace
+
+        self.__time_since_last_move = 0.0
+        self.__time_since_last_attack = COOLDOWN
+
+        self.moves = 0
+        self.attacks = 0
+        self.running = True
+
+    def close(self) -> None:
+        """Fin de la partie pour ce joueur (remplace la fermeture de la fenêtre)."""
+        self.running = False
+
+    def update(self, delta_time: float) -> None:
+        self.game_client.handle_messages(self.game)
+        if not self.running:
+            return
+
+        game = self.game
+        if game.state == GameState.STARTED:
+            game.player_id = self.game_client.who_am_i()
+            game.state = GameState.WAITING_LEVEL
+            self.game_client.send_level_query()
+        elif game.state == GameState.LEVEL_RECEIVED:
+            game.state = GameState.WAITING_PLAYERS_LIST
+            self.game_client.send_players_list_query()
+        elif game.state == GameState.PLAYERS_LIST_RECEIVED:
+            game.state = GameState.PLAYING_LEVEL
+        elif game.state == GameState.PLAYING_LEVEL:
+            self.__time_since_last_move += delta_time
+            self.__time_since_last_attack += delta_time
+
+            if self.__time_since_last_move >= self.moving_pace:
+                self.__time_since_last_move = 0.0
+                player = game.get_current_player()
+
+                if self.__time_since_last_attack >= COOLDOWN and self.policy.wants_to_attack(game):
+                    self.__time_since_last_attack = 0.0
+                    self.__attack()
+
+                facing = self.policy.next_move(game)
+                if facing and MOVES[facing](player, game.level):
+                    self.moves += 1
+                    self.game_client.send_position(player.position, player.get_facing())
+
+    def __attack(self) -> None:
+        """Même règle que NinjaVSSamourais.__attack."""
+        game = self.game
+        player = game.get_current_player()
+        if game.i_am_the_ninja():
+            target = game.ninja_attack_target()
+            if target is not None:
+                self.attacks += 1
+                self.game_client.send_attack(player.damages, target)
+        elif game.is_ninja_visible_by(game.player_id):
+            self.attacks += 1
+            self.game_client.send_attack(player.damages, 0)
+
+    def stop(self) -> None:
+        self.running = False
+        self.game_client.stop()
+
+
+async def run_bot(host: str, port: int, policy, codec: str = NetSettings.CODEC, duration: float = None,
+                  start_delay: float = 0.0, moving_pace: float = MOVING_PACE, wrap_network_client=None) -> HeadlessPlayer:
+    """
+        Connecte un joueur sans affichage et le fait jouer jusqu'à la fin de sa partie (ou pendant duration s).
+        wrap_network_client permet d'intercaler un objet de même interface (ex.: mesures du test de charge).
+    """
+    await asyncio.sleep(start_delay)
+
+    network_client = AsyncNetClient(host, port, codec)
+    await network_client.connect()
+    if wrap_network_client:
+        network_client = wrap_network_client(network_client)
+    bot = HeadlessPlayer(lambda close: GameClient(host, port, codec, network_client, close), policy, moving_pace)
+
+    loop = asyncio.get_running_loop()
+    started = last_update = loop.time()
+    while bot.running and (duration is None or loop.time() - started < duration):
+        # Les messages sont traités dès leur arrivée; les déplacements restent cadencés par moving_pace
+        try:
+            await asyncio.wait_for(network_client.wait_for_messages(), moving_pace)
+        except asyncio.TimeoutError:
+            pass
+        now = loop.time()
+        bot.update(now - last_update)
+        last_update = now
+
+    bot.stop()
+    return bot
+
+
+def create_policy(name: str, script: str, seed: int or None):
+    if name == 'scripted':
+        return ScriptedPolicy(script)
+    return POLICIES[name](seed=seed)
+
+
+async def run_bots(args) -> list:
+    """Fait jouer tous les bots dans une seule boucle asyncio (connexions étalées sur ramp_up secondes)."""
+    bots = []
+    for index in range(args.bots):
+        seed = None if args.seed is None else args.seed + index
+        start_delay = index * args.ramp_up / args.bots
+        bots.append(run_bot(args.host, args.port, create_policy(args.policy, args.script, seed), args.codec,
+                            args.duration, start_delay))
+    return await asyncio.gather(*bots)
+
+
+def main() -> None:
+    """Programme principal des joueurs sans affichage (génération de charge)."""
+    parser = argparse.ArgumentParser(description="Ninja VS Samouraïs headless bots")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=NetSettings.SERVER_PORT)
+    parser.add_argument('--bots', type=int, default=7, help="nombre de joueurs simulés dans ce processus")
+    parser.add_argument('--policy', choices=['random', 'scripted', 'chase'], default='chase')
+    parser.add_argument('--script', default='nnnneeeesssswwww',
+                        help="directions rejouées par la politique scripted ('.' pour rester sur place)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--duration', type=float, default=None, help="durée maximale d'une partie (secondes)")
+    parser.add_argument('--ramp-up', type=float, default=0.0, help="délai (secondes) pour connecter tous les bots")
+    parser.add_argument('--codec', choices=[NetCodec.TEXT, NetCodec.BINARY], default=NetSettings.CODEC)
+    args = parser.parse_args()
+
+    try:
+        bots = asyncio.run(run_bots(args))
+    except KeyboardInterrupt:
+        return
+
+    print(f"{len(bots)} bots: {sum(bot.moves for bot in bots)} moves, {sum(bot.attacks for bot in bots)} attacks")
+
+
+if __name__ == '__main__':
+    main()
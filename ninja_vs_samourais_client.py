@@ -32,7 +32,7 @@ def main() -> None:
 
         game = Game()
 
-        game_client = GameClient(server_ip)
+        game_client = GameClient(server_ip, close_window=close_window)
         game_client.start()
 
         NinjaVSSamourais(game, game_client)
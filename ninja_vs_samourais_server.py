@@ -1,12 +1,18 @@
-from time import sleep
+import argparse
+import asyncio
 
 from game import Game
+from game_room import PLAYERS_PER_ROOM
 from game_server import GameServer
+from game_supervisor import GameSupervisor
+from metrics import MetricsServer
+from network import NetSelectorServer
+from network_async import AsyncNetServer
+from tick_scheduler import DEFAULT_TICK_RATE
+from tick_scheduler import TickScheduler
 
-SLEEP_TIME = 0.05
 
-
-def main(game_server: GameServer) -> None:
+def main(game_server: GameServer, scheduler: TickScheduler) -> None:
     """Programme principal du serveur de Ninja VS Samouraïs."""
     game = Game()
     level_correct = game.next_level()
@@ -14,18 +20,88 @@ def main(game_server: GameServer) -> None:
         server.stop()
         exit()
 
-    while True:
+    scheduler.add_task(lambda: game_server.handle_messages(game))
+    scheduler.add_task(game_server.send_snapshots)
+    scheduler.run()
+
+
+async def async_main(game_server: GameServer, scheduler: TickScheduler) -> None:
+    """Programme principal du serveur avec la couche réseau asyncio: les messages sont traités dès leur arrivée."""
+    game = Game()
+    level_correct = game.next_level()
+    if not level_correct:
+        game_server.stop()
+        return
+
+    await game_server.start_async()
+    print(f'Game server started at {game_server.get_ip()} on port {game_server.get_port()}')
+
+    # Seul le travail périodique (instantanés) suit les ticks; les messages n'attendent pas le prochain tick.
+    scheduler.add_task(game_server.send_snapshots)
+    ticks = asyncio.create_task(scheduler.run_async())
+
+    while not ticks.done():
+        await game_server.wait_for_messages()
         game_server.handle_messages(game)
-        sleep(SLEEP_TIME)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serveur de Ninja VS Samouraïs")
+    parser.add_argument('--selector', action='store_true',
+                        help="sert toutes les sessions dans une seule boucle (selectors) plutôt qu'avec des threads")
+    parser.add_argument('--asyncio', action='store_true',
+                        help="sert toutes les sessions avec asyncio, sans attente active entre les messages")
+    parser.add_argument('--snapshot', action='store_true',
+                        help="regroupe les positions en un instantané par client à chaque tick plutôt que de les relayer")
+    parser.add_argument('--tick-rate', type=float, default=DEFAULT_TICK_RATE,
+                        help="nombre de ticks du serveur par seconde")
+    parser.add_argument('--rooms', type=int, default=1,
+                        help="nombre maximal de parties hébergées en même temps (par processus)")
+    parser.add_argument('--udp', action='store_true',
+                        help="offre aux clients un canal UDP pour les positions (le contrôle reste sur TCP)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="nombre de processus qui se partagent les parties (plus de 1: superviseur et workers)")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="publie les mesures du serveur sur http://127.0.0.1:PORT/metrics (et /metrics.json); "
+                             "avec --workers, le processus de travail i utilise PORT + i")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        supervisor = GameSupervisor(args.workers, max_rooms=args.rooms, snapshot=args.snapshot,
+                                    tick_rate=args.tick_rate, metrics_port=args.metrics_port)
+        supervisor.start()
+        print(f'Game supervisor started on port {supervisor.get_port()} with {args.workers} workers')
+        try:
+            supervisor.run()
+        except KeyboardInterrupt:
+            supervisor.stop()
+        exit()
+
+    tick_scheduler = TickScheduler(args.tick_rate)
+    max_sessions = args.rooms * PLAYERS_PER_ROOM
+
+    if args.metrics_port is not None:
+        metrics_server = MetricsServer(port=args.metrics_port)
+        metrics_server.start()
+        print(f'Metrics served at http://127.0.0.1:{metrics_server.get_port()}/metrics')
+
+    if args.asyncio:
+        server = GameServer(network_server=AsyncNetServer(max_sessions=max_sessions, announce_sessions=False),
+                            snapshot=args.snapshot, max_rooms=args.rooms, udp=args.udp)
+        try:
+            asyncio.run(async_main(server, tick_scheduler))
+        except KeyboardInterrupt:
+            server.stop()
+            print(tick_scheduler.summary())
+        exit()
 
-    server = GameServer()
+    network_server = NetSelectorServer(max_sessions=max_sessions, announce_sessions=False) if args.selector else None
+    server = GameServer(network_server=network_server, snapshot=args.snapshot, max_rooms=args.rooms, udp=args.udp)
     server.start()
     print(f'Game server started at {server.get_ip()} on port {server.get_port()}')
 
     try:
-        main(server)
+        main(server, tick_scheduler)
     except KeyboardInterrupt:
         server.stop()
+        print(tick_scheduler.summary())
@@ -6,6 +6,7 @@ from game_client import GameClient
 from players import Ninja, Samourai
 from tile import Tile
 from tile import TileType
+from visibility import VisibilityTable
 
 import threading as th
 
@@ -22,7 +23,6 @@ SCREEN_TITLE = 'Ninja vs Samouraïs'
 
 MOVING_PACE = 5 / 60
 BLOCK_UNIT = 10
-SAMURAI_VIEW_RANGE_X = SAMURAI_VIEW_RANGE_Y = 50
 
 
 class NinjaVSSamourais(arcade.Window):
@@ -183,33 +183,22 @@ class NinjaVSSamourais(arcade.Window):
     @staticmethod
     def __draw_viewing_region(game: Game) -> bool:
         """Dessine le champ de vision du joueur (si samouraï). Retourne True si le ninja s'y trouve."""
-        ninja = game.get_ninja()
-        ninja_in_viewing_region = False
-
-        # Récupérer le champ de vision du samouraï
+        # Récupérer le champ de vision du samouraï (déjà arrêté par les murs)
         samurai = game.get_current_player()
-        viewing_region = samurai.get_viewing_region(
-            SAMURAI_VIEW_RANGE_X, SAMURAI_VIEW_RANGE_Y)
+        viewing_region = VisibilityTable.for_level(game.level).visible_cells(samurai.position)
 
         # Afficher les tuiles du champ de vision
-        for path in viewing_region:
-            for pos in path:
-                if ninja.position[0] == pos[0] and ninja.position[1] == pos[1]:
-                    ninja_in_viewing_region = True
-
-                tile = game.level.get_tile(pos[0], pos[1])
-                color = Tile.TYPES_AND_COLORS.get(tile.tile_type)
+        for pos in viewing_region:
+            tile = game.level.get_tile(pos[0], pos[1])
+            color = Tile.TYPES_AND_COLORS.get(tile.tile_type)
 
-                if not color:
-                    color = Tile.TYPES_AND_COLORS.get(TileType.GROUND)
-
-                arcade.draw_rectangle_filled(5 + pos[0] * BLOCK_UNIT,
-                                             SCREEN_HEIGHT - (5 + pos[1] * BLOCK_UNIT), 8, 8, color)
+            if not color:
+                color = Tile.TYPES_AND_COLORS.get(TileType.GROUND)
 
-                if color == Tile.TYPES_AND_COLORS.get(TileType.WALL):
-                    break
+            arcade.draw_rectangle_filled(5 + pos[0] * BLOCK_UNIT,
+                                         SCREEN_HEIGHT - (5 + pos[1] * BLOCK_UNIT), 8, 8, color)
 
-        return ninja_in_viewing_region
+        return game.is_ninja_visible_by(game.player_id)
 
     @staticmethod
     def __health_bar(game: Game) -> None:
@@ -228,34 +217,10 @@ class NinjaVSSamourais(arcade.Window):
     @staticmethod
     def __attack(game: Game, game_client: GameClient, ninja_in_viewing_region: bool) -> None:
         player = game.get_current_player()
-        ninja = game.get_ninja()
         if game.i_am_the_ninja():
-            axis_position = list(ninja.position)
-            if ninja.facing_east:
-                iteration = 1
-                position_to_iterate = 0
-   
-            elif ninja.facing_north:
-                iteration = -1
-                position_to_iterate = 1
-
-            elif ninja.facing_south:
-                iteration = 1
-                position_to_iterate = 1
-
-            elif ninja.facing_west:
-                iteration = -1
-                position_to_iterate = 0
-
-            while axis_position[position_to_iterate] >= 0 and axis_position[position_to_iterate] < game.level.height - 1:
-                axis_position[position_to_iterate] += iteration
-                if game.check_for_wall(axis_position):
-                    break
-
-                target = game.check_for_ennemy(axis_position)
-                if target != None:
-                    game_client.send_attack(player.damages, target)
-                    break
+            target = game.ninja_attack_target()
+            if target is not None:
+                game_client.send_attack(player.damages, target)
         elif ninja_in_viewing_region:
             game_client.send_attack(player.damages, 0)
 
@@ -0,0 +1,104 @@
+import weakref
+
+from array import array
+from collections import deque
+from functools import lru_cache
+
+from level import Level
+from players import Player
+from tile import Tile
+
+
+UNREACHABLE = 0xFFFF
+DEFAULT_CACHE_SIZE = 8      # cibles dont le champ est conservé (LRU), par niveau: une par salle qui partage le niveau
+
+# Déplacement d'un joueur dans une direction (Level.DIRECTIONS), par la même interface que les clients humains
+MOVES = {'n': Player.move_north, 's': Player.move_south, 'e': Player.move_east, 'w': Player.move_west}
+
+
+class DistanceField:
+    """
+        Champ des distances (en pas) de chaque case d'un niveau jusqu'à une case cible, par un parcours en largeur.
+        Un seul objet par niveau (for_level) sert à tous les bots: les champs des dernières cibles (la case du ninja
+        de chaque salle qui partage le niveau) sont conservés, et chaque bot n'a qu'à descendre la pente.
+    """
+
+    __fields = weakref.WeakKeyDictionary()  # {niveau: champ}
+
+    def __init__(self, level: Level, cache_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self.__width = level.width
+        self.__height = level.height
+
+        # Un octet par case: 1 si la case peut être occupée par un joueur
+        walkable_table = Tile.WALKABLE_BY_CODE.ljust(256, b'\0')
+        self.__walkable = bytes(level.grid).translate(walkable_table)
+
+        self.__distances = array('H', [UNREACHABLE]) * (self.__width * self.__height)
+        self.__flood = lru_cache(maxsize=cache_size)(self.__compute)
+        self.computations = 0   # nombre de parcours effectués (les autres demandes viennent du cache)
+
+    @classmethod
+    def for_level(cls, level: Level):
+        """Retourne le champ partagé d'un niveau (créé à la première demande)."""
+        field = cls.__fields.get(level)
+        if field is None:
+            field = cls.__fields[level] = cls(level)
+        return field
+
+    def update(self, target: tuple) -> None:
+        """Sélectionne le champ vers la case target (x, y), calculé au besoin."""
+        self.__distances = self.__flood(tuple(target))
+
+    def __compute(self, target: tuple) -> array:
+        self.computations += 1
+
+        width = self.__width
+        size = width * self.__height
+        distances = array('H', [UNREACHABLE]) * size
+
+        x, y = target
+        if not (0 <= x < width and 0 <= y < self.__height):
+            return distances
+
+        start = y * width + x
+        distances[start] = 0
+        queue = deque([start])
+        walkable = self.__walkable
+        while queue:
+            cell = queue.popleft()
+            distance = distances[cell] + 1
+            column = cell % width
+            for neighbour, inside in ((cell - width, cell >= width), (cell + width, cell + width < size),
+                                      (cell - 1, column > 0), (cell + 1, column < width - 1)):
+                if inside and walkable[neighbour] and distances[neighbour] == UNREACHABLE:
+                    distances[neighbour] = distance
+                    queue.append(neighbour)
+
+        return distances
+
+    def distance(self, x, y: int) -> int:
+        """Retourne le nombre de pas de (x, y) jusqu'à la cible (UNREACHABLE si elle ne peut être atteinte)."""
+        if 0 <= x < self.__width and 0 <= y < self.__height:
+            return self.__distances[y * self.__width + x]
+        return UNREACHABLE
+
+    def next_move(self, position: tuple) -> str or None:
+        """Retourne la direction ('n', 's', 'e', 'w') qui rapproche le plus de la cible (None si aucune)."""
+        best = self.distance(*position)
+        facing = None
+        for direction, (delta_x, delta_y) in Level.DIRECTIONS.items():
+            distance = self.distance(position[0] + delta_x, position[1] + delta_y)
+            if distance < best:
+                best = distance
+                facing = direction
+        return facing
+
+
+def move_towards(player: Player, level: Level, target: tuple) -> bool:
+    """Déplace un joueur d'une case vers la cible en suivant le champ partagé du niveau. Retourne True s'il a bougé."""
+    field = DistanceField.for_level(level)
+    field.update(target)
+    facing = field.next_move(player.position)
+    if facing is None:
+        return False
+    return MOVES[facing](player, level)
@@ -8,6 +8,7 @@ class Player:
     __HP_MAX = 10
 
     def __init__(self, x: int, y: int, damages=0) -> None:
+        self.position_listener = None   # fonction appelée (ancienne position, nouvelle position) à chaque déplacement
         self.position = (x, y)
 
         self.__facing_south = True
@@ -19,9 +20,7 @@ class Player:
         self.__hp_current = self.__HP_MAX
 
     def __move(self, level: Level, delta_x, delta_y: int) -> bool:
-        tile = level.get_tile(
-            self.position[0] + delta_x, self.position[1] + delta_y)
-        if tile.walkable:
+        if level.is_walkable(self.position[0] + delta_x, self.position[1] + delta_y):
             self.position = (self.position[0] +
                              delta_x, self.position[1] + delta_y)
             return True
@@ -119,6 +118,8 @@ class Player:
 
     @position.setter
     def position(self, position: tuple) -> None:
+        if self.position_listener:
+            self.position_listener(self.__position, position)
         self.__position = position
 
     @player_active.setter
@@ -149,7 +150,8 @@ class Samourai(Player):
 
     __SAMOURAI_DAMAGES = 2
 
-    __VIEWING_REGION_DELTAS = [
+    # Rayons du champ de vision (cases relatives, de la plus proche à la plus éloignée); un mur arrête le rayon
+    VIEWING_REGION_DELTAS = [
         [(0, -1), (0, -2), (-1, -3), (-1, -4)],
         [(0, -1), (0, -2), (0, -3), (0, -4)],
         [(0, -1), (0, -2), (1, -3), (1, -4)],
@@ -186,26 +188,3 @@ class Samourai(Player):
 
     def __init__(self, x, y: int) -> None:
         super().__init__(x, y, self.__SAMOURAI_DAMAGES)
-        self.last_drawn_postition = None
-        self.tiles = []
-
-    def get_viewing_region(self, width: int, height: int) -> list:
-        """Retourne le champ de vision du samouraï."""
-
-        if not (self.position == self.last_drawn_postition) or not self.last_drawn_postition:
-            self.last_drawn_postition = self.position
-            self.tiles.clear()
-            for path in self.__VIEWING_REGION_DELTAS:
-                correct_path = []
-                for delta in path:
-                    x = self.position[0] + delta[0]
-                    y = self.position[1] + delta[1]
-
-                    if (0 <= x < width) and (0 <= y < height):
-                        correct_path.append((x, y))
-                    else:
-                        break
-
-                self.tiles.append(correct_path)
-
-        return self.tiles
@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+from bisect import bisect_left
+
+
+DEFAULT_TICK_RATE = 20      # ticks par seconde
+MAX_CATCH_UP_TICKS = 5      # au-delà de ce retard, les ticks manqués sont abandonnés plutôt que rattrapés
+
+
+class DurationHistogram:
+    """Histogramme de durées (en secondes) à seuils fixes exprimés en millisecondes."""
+
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+    def __init__(self, buckets_ms: tuple = BUCKETS_MS) -> None:
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)   # la dernière case reçoit tout ce qui dépasse le dernier seuil
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect_left(self.buckets_ms, seconds * 1000)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction: float) -> float:
+        """Retourne le seuil (ms) du premier intervalle qui contient la fraction demandée des mesures."""
+        if not self.count:
+            return 0.0
+        threshold = fraction * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= threshold:
+                return self.buckets_ms[index] if index < len(self.buckets_ms) else self.max * 1000
+        return self.max * 1000
+
+    def summary(self) -> str:
+        mean_ms = self.total / self.count * 1000 if self.count else 0.0
+        return f"mean {mean_ms:.2f} ms, p50 <= {self.percentile(0.5):g} ms, " \
+               f"p99 <= {self.percentile(0.99):g} ms, max {self.max * 1000:.2f} ms"
+
+
+class TickScheduler:
+    """
+        Exécute des tâches à fréquence fixe selon une horloge monotone.
+        Un tick en retard est rattrapé immédiatement; au-delà de max_catch_up ticks de retard, les ticks manqués
+        sont abandonnés et comptés. Le temps de traitement de chaque tick est mesuré.
+    """
+
+    def __init__(self, rate: float = DEFAULT_TICK_RATE, max_catch_up: int = MAX_CATCH_UP_TICKS) -> None:
+        self.period = 1 / rate
+        self.max_catch_up = max_catch_up
+
+        self.__tasks = []
+        self.__next_tick = 0.0
+
+        self.ticks = 0
+        self.overruns = 0   # ticks dont le traitement a duré plus d'une période
+        self.skipped = 0    # ticks abandonnés parce que le serveur avait trop de retard
+        self.durations = DurationHistogram()
+
+        self.running = False
+
+    def add_task(self, task) -> None:
+        """Ajoute une fonction (sans argument) à appeler à chaque tick."""
+        self.__tasks.append(task)
+
+    def __delay(self) -> float:
+        """Planifie le prochain tick et retourne le délai d'attente avant celui-ci (0 s'il faut rattraper)."""
+        self.__next_tick += self.period
+        now = time.monotonic()
+        late = now - self.__next_tick
+
+        if late <= 0:
+            return -late
+
+        if late >= self.max_catch_up * self.period:
+            missed = int(late / self.period)
+            self.skipped += missed
+            self.__next_tick += missed * self.period
+            print(f"WARNING: server is falling behind, {missed} ticks skipped")
+
+        return 0.0
+
+    def run_once(self) -> None:
+        """Exécute les tâches d'un tick et mesure leur durée."""
+        start = time.monotonic()
+        for task in self.__tasks:
+            task()
+        duration = time.monotonic() - start
+
+        self.ticks += 1
+        self.durations.record(duration)
+        if duration > self.period:
+            self.overruns += 1
+
+    def run(self) -> None:
+        """Exécute les ticks jusqu'à l'appel de stop()."""
+        self.running = True
+        self.__next_tick = time.monotonic()
+
+        while self.running:
+            self.run_once()
+            delay = self.__delay()
+            if delay:
+                time.sleep(delay)
+
+    async def run_async(self) -> None:
+        """Équivalent de run() pour une boucle asyncio."""
+        self.running = True
+        self.__next_tick = time.monotonic()
+
+        while self.running:
+            self.run_once()
+            await asyncio.sleep(self.__delay())
+
+    def stop(self) -> None:
+        self.running = False
+
+    def summary(self) -> str:
+        return f"{self.ticks} ticks at {1 / self.period:g} Hz, {self.overruns} overruns, {self.skipped} skipped, " \
+               f"tick time {self.durations.summary()}"
@@ -36,28 +36,38 @@ class Tile:
                          'E': {'tileType': TileType.EXIT, 'walkable': True}
                         }
 
+    SYMBOLS_BY_TYPE = {value['tileType']: symbol for symbol, value in TYPES_AND_SYMBOLS.items()}
+
+    # Codes compacts des types de tuiles (l'ordre de TYPES_AND_SYMBOLS), stockés un octet par case dans les niveaux
+    SYMBOLS = tuple(TYPES_AND_SYMBOLS)
+    CODES_BY_SYMBOL = {symbol: code for code, symbol in enumerate(SYMBOLS)}
+    TYPES_BY_CODE = tuple(value['tileType'] for value in TYPES_AND_SYMBOLS.values())
+    CODES_BY_TYPE = {tile_type: code for code, tile_type in enumerate(TYPES_BY_CODE)}
+    WALKABLE_BY_CODE = bytes(value['walkable'] for value in TYPES_AND_SYMBOLS.values())
+    GROUND_CODE = CODES_BY_SYMBOL[' ']
+    WALL_CODE = CODES_BY_SYMBOL['W']
+
+    # Table de traduction (bytes.translate) des symboles vers les codes; INVALID_CODE pour tout autre octet
+    INVALID_CODE = 0xFF
+    CODES_TABLE = bytes(map(CODES_BY_SYMBOL.get, map(chr, range(256)), [INVALID_CODE] * 256))
+
 
     def __init__(self, walkable: bool = True, tile_type: TileType = TileType.GROUND) -> None:
         self.__walkable = walkable
         self.__tile_type = tile_type
 
     def __str__(self) -> str:
-        tile_type = self.__tile_type
-        symbol = ''
-        for key, value in self.TYPES_AND_SYMBOLS.items():
-            if tile_type == value['tileType']:
-                symbol = key
-        return symbol
+        return self.SYMBOLS_BY_TYPE.get(self.__tile_type, '')
 
     @staticmethod
     def create_from_symbol(symbol: str):
-        """Crée et configure une tuile en fonction du symbole."""
-        type_and_symbol = Tile.TYPES_AND_SYMBOLS
-        tile = Tile()
-        value = type_and_symbol.get(symbol)
-        if value:
-            tile = Tile(tile_type= value['tileType'], walkable= value['walkable'])
-        return tile
+        """Retourne la tuile (partagée) correspondant au symbole."""
+        return Tile.from_code(Tile.CODES_BY_SYMBOL.get(symbol, Tile.GROUND_CODE))
+
+    @staticmethod
+    def from_code(code: int):
+        """Retourne la tuile correspondant à un code de type. Les tuiles sont partagées (poids mouche) et immuables."""
+        return _SHARED_TILES[code]
 
     @staticmethod
     def get_color_for(tile_type: TileType) -> tuple:
@@ -70,3 +80,6 @@ class Tile:
     @property
     def walkable(self) -> bool:
         return self.__walkable
+
+
+_SHARED_TILES = tuple(Tile(value['walkable'], value['tileType']) for value in Tile.TYPES_AND_SYMBOLS.values())
@@ -0,0 +1,57 @@
+import weakref
+
+from functools import lru_cache
+
+from level import Level
+from players import Samourai
+
+
+DEFAULT_CACHE_SIZE = 4096   # nombre de cases dont le champ de vision est conservé (LRU), par niveau
+
+
+class VisibilityTable:
+    """
+        Champs de vision des samouraïs d'un niveau, calculés une seule fois par case (au besoin) et conservés.
+        Chaque rayon de Samourai.VIEWING_REGION_DELTAS s'arrête au bord du niveau et au premier mur (visible lui-même).
+        Une seule table est partagée par niveau (for_level), entre l'affichage du client et les vérifications du serveur.
+    """
+
+    __tables = weakref.WeakKeyDictionary()  # {niveau: table}
+
+    def __init__(self, level: Level, deltas: list = Samourai.VIEWING_REGION_DELTAS,
+                 cache_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self.__level = weakref.ref(level)   # la table ne doit pas garder le niveau en vie
+        self.__deltas = deltas
+        self.__lookup = lru_cache(maxsize=cache_size)(self.__compute)
+
+    @classmethod
+    def for_level(cls, level: Level):
+        """Retourne la table partagée d'un niveau (créée à la première demande)."""
+        table = cls.__tables.get(level)
+        if table is None:
+            table = cls.__tables[level] = cls(level)
+        return table
+
+    def __compute(self, position: tuple) -> tuple:
+        level = self.__level()
+        cells = {}  # dictionnaire utilisé comme ensemble ordonné: les rayons partagent leurs premières cases
+
+        for ray in self.__deltas:
+            for delta_x, delta_y in ray:
+                x = position[0] + delta_x
+                y = position[1] + delta_y
+                if not (0 <= x < level.width and 0 <= y < level.height):
+                    break
+                cells[(x, y)] = True
+                if level.is_wall(x, y):
+                    break
+
+        return tuple(cells), frozenset(cells)
+
+    def visible_cells(self, position: tuple) -> tuple:
+        """Retourne les cases vues depuis une position, rayon par rayon."""
+        return self.__lookup(tuple(position))[0]
+
+    def is_visible(self, position, target: tuple) -> bool:
+        """Indique si la case target est vue depuis une position."""
+        return tuple(target) in self.__lookup(tuple(position))[1]
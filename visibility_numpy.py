@@ -0,0 +1,71 @@
+try:
+    import numpy
+except ImportError:     # NumPy est optionnel: sans lui, VisibilityTable (visibility.py) fait le même travail case par case
+    numpy = None
+
+from level import Level
+from players import Samourai
+from tile import Tile
+
+
+NUMPY_AVAILABLE = numpy is not None
+
+
+class VectorizedVisibility:
+    """
+        Champs de vision de tous les samouraïs d'un coup, par opérations sur des tableaux NumPy.
+        Mêmes rayons que Samourai.VIEWING_REGION_DELTAS et mêmes règles que VisibilityTable: un rayon s'arrête au bord
+        du niveau et au premier mur (visible lui-même).
+    """
+
+    def __init__(self, level: Level, deltas: list = Samourai.VIEWING_REGION_DELTAS) -> None:
+        if not NUMPY_AVAILABLE:
+            raise ImportError("NumPy is required for vectorized visibility")
+
+        self.width = level.width
+        self.height = level.height
+        self.__walls = numpy.frombuffer(level.grid, dtype=numpy.uint8).reshape(self.height, self.width) == \
+            Tile.WALL_CODE
+
+        # Rayons complétés à la même longueur; les cases ajoutées sont marquées invalides et arrêtent le rayon
+        length = max(len(ray) for ray in deltas)
+        self.__delta_x = numpy.zeros((len(deltas), length), dtype=numpy.intp)
+        self.__delta_y = numpy.zeros((len(deltas), length), dtype=numpy.intp)
+        self.__valid = numpy.zeros((len(deltas), length), dtype=bool)
+        for index, ray in enumerate(deltas):
+            self.__delta_x[index, :len(ray)] = [delta[0] for delta in ray]
+            self.__delta_y[index, :len(ray)] = [delta[1] for delta in ray]
+            self.__valid[index, :len(ray)] = True
+
+    def __cast_rays(self, points) -> tuple:
+        """Retourne les cases (x, y) de tous les rayons de chaque position et celles qui sont vues."""
+        x = points[:, 0, None, None] + self.__delta_x   # (joueur, rayon, pas)
+        y = points[:, 1, None, None] + self.__delta_y
+
+        outside = ~self.__valid | (x < 0) | (x >= self.width) | (y < 0) | (y >= self.height)
+        walls = self.__walls[y.clip(0, self.height - 1), x.clip(0, self.width - 1)] & ~outside
+
+        # Une case est vue si elle est dans le niveau et qu'aucune case précédente du rayon n'est dehors ou un mur
+        blocked = numpy.logical_or.accumulate(outside | walls, axis=2)
+        blocked_before = numpy.zeros_like(blocked)
+        blocked_before[..., 1:] = blocked[..., :-1]
+        return x, y, ~outside & ~blocked_before
+
+    def matrix(self, positions: list):
+        """
+            Retourne la matrice de visibilité (joueur, y, x) de booléens pour une liste de positions (x, y):
+            matrix[i, y, x] est vrai si la case (x, y) est vue depuis positions[i].
+        """
+        points = numpy.asarray(positions, dtype=numpy.intp).reshape(-1, 2)
+        x, y, visible = self.__cast_rays(points)
+
+        matrix = numpy.zeros((len(points), self.height, self.width), dtype=bool)
+        players = numpy.broadcast_to(numpy.arange(len(points))[:, None, None], visible.shape)
+        matrix[players[visible], y[visible], x[visible]] = True
+        return matrix
+
+    def can_see(self, positions: list, target: tuple):
+        """Retourne, pour chaque position, si la case target (x, y) est vue depuis celle-ci."""
+        points = numpy.asarray(positions, dtype=numpy.intp).reshape(-1, 2)
+        x, y, visible = self.__cast_rays(points)
+        return (visible & (x == target[0]) & (y == target[1])).any(axis=(1, 2))